@@ -2,13 +2,19 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import random
+import time
 import numpy as np
-from collections import deque
 from DQN_model import QNetwork
-from ReplayBuffer import ReplayBuffer
+from ReplayBuffer import make_replay
 
 class DQN_agent:
-    def __init__(self, state_size, action_size):
+    # replay picks the replay buffer ("uniform", "prioritized" or "nstep", see
+    # make_replay), replay_options are passed on to it.
+    # The target network follows the model every target_update_every learner
+    # steps, either softly (Polyak averaging with tau) or with a hard copy
+    def __init__(self, state_size, action_size, replay="uniform", replay_options=None,
+                 replay_capacity=50000, target_update="soft", target_update_every=1,
+                 tau=0.01):
         self.state_size = state_size
         self.action_size = action_size
 
@@ -20,68 +26,128 @@ class DQN_agent:
         self.target_model.load_state_dict(self.model.state_dict())
         self.target_model.eval()
 
+        # Target network maintenance
+        if target_update not in ("soft", "hard"):
+            raise ValueError(f"unknown target update {target_update!r}")
+        self.target_update = target_update
+        self.target_update_every = target_update_every
+        self.tau = tau
+        self.learn_steps = 0
+        self.model_params = list(self.model.parameters())
+        self.target_params = list(self.target_model.parameters())
+
         # Optimizer
         self.optimizer = optim.Adam(self.model.parameters(), lr=0.0005)
 
-        # Replay memory
-        self.memory = deque(maxlen=50000)
-        self.batch_size = 128
-
         # Parameters DQN
         self.gamma = 0.99
         self.epsilon = 0.995
         self.epsilon_min = 0.35
         self.epsilon_decay = 0.9995
 
-        self.replay = ReplayBuffer()
+        # Replay memory, the only place transitions are kept for training
+        self.replay = make_replay(replay, replay_capacity, state_size, self.gamma,
+                                  **(replay_options or {}))
+        self.batch_size = 128
+
+        # Input of act_batch, reused between calls
+        self.act_input = None
+
+        # Sampling throughput
+        self.samples_drawn = 0
+        self.sample_time = 0.0
 
-    def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+    # stream identifies the game when several are interleaved
+    def remember(self, state, action, reward, next_state, done, stream=0):
+        self.replay.push((state, action, reward, next_state, done), stream)
+
+    # Replay fill level and sampling throughput
+    def replay_stats(self):
+        size = len(self.replay)
+        return {
+            "size": size,
+            "fill": size / self.replay.capacity,
+            "samples_per_sec": self.samples_drawn / self.sample_time if self.sample_time else 0.0,
+        }
 
     def act(self, state):
         if np.random.rand() < self.epsilon:
             return random.randint(0, self.action_size - 1)
 
-        state = torch.FloatTensor(state).unsqueeze(0)
-        q_values = self.model(state)
+        with torch.inference_mode():
+            state = torch.as_tensor(state, dtype=torch.float32).unsqueeze(0)
+            q_values = self.model(state)
         return torch.argmax(q_values).item()
 
+    # Epsilon-greedy actions for a (N, state_size) batch of states, e.g. from
+    # a VecEnvironment, with a single forward pass. The input tensor is
+    # allocated once per batch size and reused
+    def act_batch(self, states):
+        n = len(states)
+        if self.act_input is None or len(self.act_input) != n:
+            self.act_input = torch.zeros((n, self.state_size), dtype=torch.float32)
+            self.act_input_array = self.act_input.numpy()
+
+        explore = np.random.rand(n) < self.epsilon
+        actions = np.random.randint(0, self.action_size, size=n)
+        if explore.all():
+            return actions
+
+        self.act_input_array[:] = states
+        with torch.inference_mode():
+            greedy = self.model(self.act_input).argmax(dim=1).numpy()
+        return np.where(explore, actions, greedy)
+
     def train_step(self):
-        if len(self.memory) < self.batch_size:
+        if len(self.replay) < self.batch_size:
             return
 
-        batch = random.sample(self.memory, self.batch_size)
-        states, actions, rewards, next_states, dones = zip(*batch)
-
-        states = torch.FloatTensor(np.array(states))
-        next_states = torch.FloatTensor(np.array(next_states))
-        actions = torch.LongTensor(actions).unsqueeze(1)
-        rewards = torch.FloatTensor(rewards).unsqueeze(1)
-        dones = torch.FloatTensor(dones).unsqueeze(1)
+        start = time.perf_counter()
+        states, actions, rewards, next_states, dones, weights, indexes = \
+            self.replay.sample(self.batch_size)
+        self.sample_time += time.perf_counter() - start
+        self.samples_drawn += self.batch_size
+        actions = actions.unsqueeze(1)
+        rewards = rewards.unsqueeze(1)
+        dones = dones.unsqueeze(1)
 
         # Q(s, a)
         q_vals = self.model(states).gather(1, actions)
 
-        # Q_target = r + γ max_a' Q_target(s', a')
+        # Q_target = r + γ max_a' Q_target(s', a')  (γ^n for n-step returns)
         with torch.no_grad():
-            target_q = rewards + (1 - dones) * self.gamma * torch.max(self.target_model(next_states), dim=1, keepdim=True)[0]
+            target_q = rewards + (1 - dones) * self.replay.discount * torch.max(self.target_model(next_states), dim=1, keepdim=True)[0]
 
-        # Loss
-        loss = nn.MSELoss()(q_vals, target_q)
+        # Loss, weighted by the importance sampling weights for prioritized
+        # replay. The TD errors become the new priorities
+        td_errors = target_q - q_vals
+        if weights is not None:
+            loss = (weights.unsqueeze(1) * td_errors.pow(2)).mean()
+        else:
+            loss = nn.MSELoss()(q_vals, target_q)
+        self.replay.update_priorities(indexes, td_errors.detach().squeeze(1).numpy())
 
         # Step
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
 
-        # Soft update
-        tau = 0.01
-        for target_param, local_param in zip(self.target_model.parameters(), self.model.parameters()):
-            target_param.data.copy_(tau * local_param.data + (1.0 - tau) * target_param.data)
+        self.learn_steps += 1
+        if self.learn_steps % self.target_update_every == 0:
+            self.update_target()
 
         # Epsilon decay
         self.epsilon = max(self.epsilon_min, self.epsilon * self.epsilon_decay)
 
+    # target = target + tau * (model - target) (or a plain copy for hard
+    # updates), done in place over all the parameters with one foreach op
+    def update_target(self):
+        with torch.no_grad():
+            if self.target_update == "soft":
+                torch._foreach_lerp_(self.target_params, self.model_params, self.tau)
+            else:
+                torch._foreach_copy_(self.target_params, self.model_params)
+
     def update_epsilon(self):
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
@@ -2,11 +2,29 @@ import sys, os, math
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from src.asteroids import Asteroids
 import numpy as np
+from Observation import make_observation, SHIP_FEATURES, SAUCER_FEATURES
 
 class Environment:
     
-    def __init__(self):
-        self.game = Asteroids(False)
+    def __init__(self, headless=False, render_every=1, frame_skip=1, reward_pool="sum",
+                 observation="nearest", observation_options=None, seed=None):
+        # headless=True runs the full simulation without opening a window,
+        # otherwise only 1 in every render_every frames is drawn.
+        # Each step repeats the action for frame_skip frames and pools their
+        # rewards with reward_pool ("sum" or "max"). With "max" the frame
+        # that ends the episode is added to the max of the ones before it,
+        # so the death penalty is never lost.
+        # observation picks how the rocks are described (see Observation.py).
+        # Games with the same seed and the same actions play out the same
+        if reward_pool not in ("sum", "max"):
+            raise ValueError(f"unknown reward pool {reward_pool!r}")
+        self.frame_skip = frame_skip
+        self.reward_pool = reward_pool
+        self.observation = make_observation(observation, **(observation_options or {}))
+        self.state_size = self.observation.size
+        if not self.observation.standalone:
+            self.state_size += SHIP_FEATURES + SAUCER_FEATURES
+        self.game = Asteroids(headless, render_every, seed)
         self.game.initialiseGame()
         self.done = False
 
@@ -20,62 +38,84 @@ class Environment:
         self.last_action = None
         self.last_reward = 0.0
 
-    def reset(self):
+        # EpisodeRecorder logging the seed and actions of every episode
+        self.recorder = None
+
+    # Draw (or stop drawing) the frames, e.g. only for evaluation episodes
+    def set_rendering(self, enabled):
+        self.game.renderEnabled = enabled
+
+    # Record every episode from the next reset on (None to stop), see
+    # Recording.py
+    def set_recorder(self, recorder):
+        self.recorder = recorder
+
+    # Start a new game, from a fresh seed if one is given. When recording
+    # every game gets a seed so that it can be replayed
+    def reset(self, seed=None):
+        if self.recorder is not None:
+            if seed is None:
+                seed = self.recorder.new_seed()
+            self.recorder.start(seed, self.frame_skip, self.reward_pool)
+        if seed is not None:
+            self.game.seed(seed)
         self.game.initialiseGame()
         self.done = False
+        self.observation.reset()
         return self.get_state()
 
     def step(self, action): # net parameter
         
         self.game.current_net = None  
         self.game.last_action = action
-
-        # 1. Do action
-        self.apply_action(action)
-
-        # 2. Forward frame
-        self.game.update_one_frame()
-
-        # 3. calculate reward to current frame
-        reward = self.compute_reward()
+        if self.recorder is not None:
+            self.recorder.record(action)
+
+        # 1-3. Do the action for frame_skip frames, stopping early if the
+        # ship is destroyed (the next frame would already restart the game)
+        reward = None
+        for _ in range(self.frame_skip):
+            frame_reward, done = self.step_frame(action)
+            if reward is None:
+                reward = frame_reward
+            elif self.reward_pool == "sum" or done:
+                reward += frame_reward
+            else:
+                reward = max(reward, frame_reward)
+            if done:
+                break
 
         # 4. Save action and reward on HUD debug
         self.game.last_reward = reward
 
-        # 5. Calculate the angular difference to visualization
-        ship = self.game.ship
-        nearest = self.get_nearest_asteroid(ship.position.x, ship.position.y)
-
-        if nearest:
-            dx = nearest.position.x - ship.position.x
-            dy = nearest.position.y - ship.position.y
-
-            angle_to_asteroid = math.atan2(dy, dx)
-
-            angle_rad = math.radians(ship.angle)
-            dir_x = -math.sin(angle_rad)
-            dir_y = -math.cos(angle_rad)
-
-            ship_angle = math.atan2(dir_y, dir_x)
-
-            raw_diff = abs(angle_to_asteroid - ship_angle)
-            angle_diff = min(raw_diff, 2*math.pi - raw_diff)
-        else:
-            angle_diff = 0.0
-
-        self.game.last_angle_diff = angle_diff
-
-        # 6. Check if the episode ended
-        done = (self.game.gameState == 'exploding')
-
-        # 7. Restore the new state
+        # 5. Restore the new state
         state = self.get_state()
         self.game.current_net = None # net value
         self.game.current_state = state
         return state, reward, done
 
 
+    # The game and the observation history, to come back to with restore
+    def snapshot(self):
+        return self.game.snapshot(), self.observation.snapshot()
+
+    def restore(self, snapshot):
+        game, observation = snapshot
+        self.game.restore(game)
+        self.observation.restore(observation)
+
+    # Do the action, forward one frame and calculate its reward
+    def step_frame(self, action):
+        self.apply_action(action)
+        self.game.update_one_frame()
+        reward = self.compute_reward()
+        done = (self.game.gameState == 'exploding')
+        return reward, done
+
     def get_state(self):
+        if self.observation.standalone:
+            return self.observation.features(self.game)
+
         ship = self.game.ship
         
         x = ship.position.x / self.game.stage.width
@@ -86,34 +126,8 @@ class Environment:
 
         angle_norm = ship.angle / 360.0
 
-        # --- Nearest asteroid ---
-        nearest = self.get_nearest_asteroid(ship.position.x, ship.position.y)
-        if nearest:
-            dx = nearest.position.x - ship.position.x
-            dy = nearest.position.y - ship.position.y
-
-            dx_norm = dx / self.game.stage.width
-            dy_norm = dy / self.game.stage.height
-
-            distance = np.sqrt(dx_norm**2 + dy_norm**2)
-
-            angle_to_asteroid = math.atan2(dy, dx)
-            
-            angle_rad = math.radians(ship.angle)
-            ship_dir_x = -math.sin(angle_rad)
-            ship_dir_y = -math.cos(angle_rad)
-            ship_angle = math.atan2(ship_dir_y, ship_dir_x)
-
-            raw_diff = abs(angle_to_asteroid - ship_angle)
-            angle_diff = min(raw_diff, 2*math.pi - raw_diff)
-
-            angle_diff_norm = angle_diff / math.pi
-
-        else:
-            dx_norm = dy_norm = 0
-            distance = 1
-            angle_to_asteroid = 0
-            angle_diff_norm = 1 
+        # --- Rocks ---
+        rocks = self.observation.features(self.game)
 
         # --- Enemy (saucer) data ---
         if self.game.saucer is not None:
@@ -125,17 +139,11 @@ class Environment:
         else:
             x_enemy = y_enemy = vx_enemy = vy_enemy = 0.0
 
-        return np.array([
-            x, y,
-            vx, vy,
-            angle_norm,
-
-            dx_norm, dy_norm, distance,
-            angle_to_asteroid, angle_diff_norm,
-            x_enemy, y_enemy,
-            vx_enemy, vy_enemy
-
-        ], dtype=float)
+        return np.concatenate((
+            [x, y, vx, vy, angle_norm],
+            rocks,
+            [x_enemy, y_enemy, vx_enemy, vy_enemy]
+        ))
 
     def apply_action(self, action):
         if action == 0: self.game.ship.rotateLeft()
@@ -149,19 +157,11 @@ class Environment:
         reward = 0.1  # reward to survival
 
    
-        # Calculate actual angular alignment
-
-        nearest = self.get_nearest_asteroid(ship.position.x, ship.position.y)
-        if nearest:
-            dx = nearest.position.x - ship.position.x
-            dy = nearest.position.y - ship.position.y
+        # Calculate actual angular alignment (shared with the observation)
 
-            angle_to_asteroid = math.atan2(dy, dx)
-            ship_angle_rad = math.radians(ship.angle)
-
-            angle_diff = abs((angle_to_asteroid - ship_angle_rad + math.pi) % (2*math.pi) - math.pi)
-
-            angle_diff_norm = min(angle_diff / math.pi, 1.0)
+        features = self.game.frameFeatures()
+        if features.nearest is not None:
+            angle_diff_norm = min(features.rewardAngleDiff / math.pi, 1.0)
 
 
             reward += (1 - angle_diff_norm) * 0.5    # max +0.5
@@ -176,8 +176,7 @@ class Environment:
             if angle_diff_norm > 0.50:
                 reward -= 0.05
 
-            dist = math.sqrt(dx**2 + dy**2)
-            if dist < 100:    # Near to as asteroid
+            if features.distance < 100:    # Near to as asteroid
                 reward -= 0.5
 
         reward += ship.bulletHit * 20
@@ -195,10 +194,3 @@ class Environment:
         ship.bulletShot = 0
 
         return reward
-
-
-    def get_nearest_asteroid(self, sx, sy):
-        if not self.game.rockList:
-            return None
-        return min(self.game.rockList,
-                   key=lambda a: (a.position.x - sx)**2 + (a.position.y - sy)**2)
@@ -0,0 +1,187 @@
+import multiprocessing as mp
+import random
+import numpy as np
+from Environment import Environment
+from VecEnvironment import env_seed
+
+# Runs num_envs Environment instances spread over num_workers processes.
+# Actions and observations go through shared memory NumPy arrays, the pipes
+# to the workers only carry tiny commands, so stepping costs the same as a
+# VecEnvironment apart from one pipe round trip per worker. Finished games are
+# reset straight away like in VecEnvironment (last state in final_states).
+# A worker that dies is replaced by a new one and its games come back as done.
+# With a seed, game i is seeded with seed + i.
+class EnvironmentPool:
+
+    def __init__(self, num_envs, num_workers=None, step_timeout=60.0, seed=None, **env_kwargs):
+        if num_workers is None:
+            num_workers = min(num_envs, mp.cpu_count())
+        env_kwargs.setdefault("headless", True)
+
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.step_timeout = step_timeout
+        self.env_kwargs = env_kwargs
+        self.seed = seed
+        self.state_size = len(Environment(**env_kwargs).get_state())
+        self.restarts = 0
+
+        # Shared buffers, one row per game
+        self.buffers = {
+            "actions": mp.RawArray("i", num_envs),
+            "states": mp.RawArray("f", num_envs * self.state_size),
+            "final_states": mp.RawArray("f", num_envs * self.state_size),
+            "rewards": mp.RawArray("f", num_envs),
+            "dones": mp.RawArray("b", num_envs),
+        }
+        self.actions, self.states, self.final_states, self.rewards, self.dones = \
+            shared_arrays(self.buffers, num_envs, self.state_size)
+
+        # Worker w runs the games in slices[w]
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.slices = [slice(bounds[w], bounds[w + 1]) for w in range(num_workers)]
+        self.workers = [None] * num_workers
+        self.conns = [None] * num_workers
+        for w in range(num_workers):
+            self.start_worker(w)
+
+        self.waiting = False
+
+    def start_worker(self, w):
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(target=worker,
+                             args=(child_conn, self.slices[w], self.buffers,
+                                   self.num_envs, self.state_size, self.seed, self.env_kwargs),
+                             daemon=True)
+        process.start()
+        child_conn.close()
+        self.workers[w] = process
+        self.conns[w] = parent_conn
+
+    # Replace a dead or stuck worker. Its games start again from scratch and
+    # are reported as done so the caller doesn't bootstrap across the crash
+    def restart_worker(self, w):
+        self.restarts += 1
+        self.workers[w].kill()
+        self.workers[w].join()
+        self.conns[w].close()
+        self.start_worker(w)
+
+        games = self.slices[w]
+        self.send(w, "reset")
+        if not self.receive(w):
+            raise RuntimeError(f"environment worker {w} keeps failing")
+        self.final_states[games] = self.states[games]
+        self.rewards[games] = 0.0
+        self.dones[games] = True
+
+    def send(self, w, command):
+        try:
+            self.conns[w].send(command)
+        except (BrokenPipeError, OSError):
+            pass
+
+    def receive(self, w):
+        conn = self.conns[w]
+        try:
+            if conn.poll(self.step_timeout):
+                return conn.recv()
+        except (EOFError, OSError):
+            pass
+        return False
+
+    def wait_all(self):
+        for w in range(self.num_workers):
+            if not self.receive(w):
+                self.restart_worker(w)
+
+    def reset(self):
+        for w in range(self.num_workers):
+            self.send(w, "reset")
+        self.wait_all()
+        self.dones[:] = False
+        return self.states.copy()
+
+    # Start stepping every game with the given actions without waiting
+    def step_async(self, actions):
+        self.actions[:] = actions
+        for w in range(self.num_workers):
+            self.send(w, "step")
+        self.waiting = True
+
+    def step_wait(self):
+        self.wait_all()
+        self.waiting = False
+        return self.states.copy(), self.rewards.copy(), self.dones.astype(bool)
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.waiting:
+            self.wait_all()
+        for w in range(self.num_workers):
+            self.send(w, "close")
+        for process in self.workers:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.kill()
+        for conn in self.conns:
+            conn.close()
+
+    def __len__(self):
+        return self.num_envs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# NumPy views of the shared buffers
+def shared_arrays(buffers, num_envs, state_size):
+    actions = np.frombuffer(buffers["actions"], dtype=np.int32)
+    states = np.frombuffer(buffers["states"], dtype=np.float32).reshape(num_envs, state_size)
+    final_states = np.frombuffer(buffers["final_states"], dtype=np.float32).reshape(num_envs, state_size)
+    rewards = np.frombuffer(buffers["rewards"], dtype=np.float32)
+    dones = np.frombuffer(buffers["dones"], dtype=np.int8)
+    return actions, states, final_states, rewards, dones
+
+
+def worker(conn, games, buffers, num_envs, state_size, seed, env_kwargs):
+    # Forked workers start with a copy of the parent's random state, give
+    # each one its own (the games themselves have their own generators)
+    random.seed()
+    np.random.seed()
+
+    actions, states, final_states, rewards, dones = \
+        shared_arrays(buffers, num_envs, state_size)
+    indexes = range(games.start, games.stop)
+    envs = [Environment(seed=env_seed(seed, i), **env_kwargs) for i in indexes]
+
+    while True:
+        try:
+            command = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if command == "step":
+            for i, env in zip(indexes, envs):
+                state, reward, done = env.step(int(actions[i]))
+                rewards[i] = reward
+                dones[i] = done
+                if done:
+                    final_states[i] = state
+                    state = env.reset()
+                states[i] = state
+        elif command == "reset":
+            for i, env in zip(indexes, envs):
+                states[i] = env.reset()
+        elif command == "close":
+            break
+
+        conn.send(True)
+
+    conn.close()
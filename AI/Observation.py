@@ -0,0 +1,280 @@
+import sys, os, math
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import numpy as np
+from src.util.spritearrays import X, ANGLE
+from src.util.raster import Rasteriser
+
+# Observation builders: the part of the state that describes the rocks (and,
+# for the lidar, whatever else is in the way).
+# Environment.get_state puts the ship features before it and the saucer
+# features after it, unless the builder is standalone and makes up the whole
+# state by itself. Every builder has a size (number of features),
+# features(game) returning them as a float array and reset() called at the
+# start of every episode. Builders that remember earlier frames return them
+# from snapshot() and take them back in restore(snapshot).
+
+SHIP_FEATURES = 5
+SAUCER_FEATURES = 4
+
+# Rough radius of each rock type (large, medium, small) and of the ship, in
+# pixels, for the time to collision estimates
+ROCK_RADII = np.array([42.5, 25.5, 10.2])
+SHIP_RADIUS = 10.0
+
+
+class ObservationBuilder:
+    size = 0
+    standalone = False
+
+    def reset(self):
+        pass
+
+    def snapshot(self):
+        return None
+
+    def restore(self, snapshot):
+        pass
+
+
+# The single nearest rock (no wrap around): offset, distance, angle to it and
+# how far the ship is from pointing at it
+class NearestRock(ObservationBuilder):
+    size = 5
+
+    def features(self, game):
+        features = game.frameFeatures()
+        if features.nearest is None:
+            return np.array([0, 0, 1, 0, 1], dtype=float)
+
+        dx_norm = features.dx / game.stage.width
+        dy_norm = features.dy / game.stage.height
+        distance = np.sqrt(dx_norm**2 + dy_norm**2)
+        angle_diff_norm = features.angleDiff / math.pi
+        return np.array([dx_norm, dy_norm, distance,
+                         features.angleToRock, angle_diff_norm], dtype=float)
+
+
+# The k nearest rocks, measured across the screen edges since the stage wraps
+# around. For each one, closest first:
+#   dx, dy       offset from the ship over the stage size
+#   distance     length of that offset in pixels over the largest possible
+#   dvx, dvy     velocity relative to the ship over the ship max velocity
+#   size         1 large, 0.5 medium, 0 small
+#   ttc          frames until it hits the ship at the current velocities over
+#                horizon, 1 if it won't within horizon frames
+#   present      0 for the padding rows when there are fewer than k rocks
+# All the rocks are handled together straight from the stage state arrays.
+class KNearestRocks(ObservationBuilder):
+    per_rock = 8
+
+    def __init__(self, k=4, horizon=120):
+        self.k = k
+        self.horizon = horizon
+        self.size = k * self.per_rock
+
+        self.padding = np.zeros((k, self.per_rock))
+        self.padding[:, 2] = 1.0
+        self.padding[:, 6] = 1.0
+
+    def features(self, game):
+        out = self.padding.copy()
+        rocks = list(game.rockList)
+        if not rocks:
+            return out.ravel()
+
+        ship = game.ship
+        size = np.array((game.stage.width, game.stage.height), dtype=float)
+        state = game.stage.arrays.state
+
+        # Shortest offset and relative velocity of every rock, one row each
+        relative = state[[rock.slot for rock in rocks], X:ANGLE]
+        relative -= ship.arrays.state[ship.slot, X:ANGLE]
+        offsets = relative[:, 0:2]
+        offsets += size / 2
+        offsets %= size
+        offsets -= size / 2
+        squared = (offsets * offsets).sum(axis=1)
+
+        k = min(self.k, len(rocks))
+        if len(rocks) > k:
+            nearest = np.argpartition(squared, k - 1)[:k]
+            nearest = nearest[np.argsort(squared[nearest])]
+        else:
+            nearest = np.argsort(squared)
+        relative = relative[nearest]
+        squared = squared[nearest]
+        offsets = relative[:, 0:2]
+        velocities = relative[:, 2:4]
+        types = np.array([rocks[i].rockType for i in nearest])
+
+        # First time |offset + velocity t| reaches the sum of the radii
+        a = (velocities * velocities).sum(axis=1)
+        b = 2 * (offsets * velocities).sum(axis=1)
+        c = squared - (ROCK_RADII[types] + SHIP_RADIUS)**2
+        discriminant = b * b - 4 * a * c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ttc = (-b - np.sqrt(discriminant)) / (2 * a)
+        ttc[(b >= 0) | ~(discriminant >= 0)] = self.horizon
+        ttc[c <= 0] = 0.0
+
+        rows = out[:k]
+        rows[:, 0:2] = offsets / size
+        rows[:, 2] = np.sqrt(squared) / self.half_diagonal(size)
+        rows[:, 3:5] = velocities / ship.maxVelocity
+        rows[:, 5] = 1.0 - types / 2.0
+        rows[:, 6] = np.minimum(ttc, self.horizon) / self.horizon
+        rows[:, 7] = 1.0
+        return out.ravel()
+
+    # Farthest a rock can be from the ship on a wrapping stage
+    def half_diagonal(self, size):
+        return math.hypot(size[0], size[1]) / 2
+
+
+# Rays cast from the ship's nose, spread evenly over fov degrees around the
+# direction it points in. With the full 360 degrees the first ray goes
+# straight ahead; a narrower fov is covered from -fov/2 to fov/2, so only an
+# odd number of rays has one straight ahead. Each feature is the distance
+# along a ray to the nearest edge of a rock, the saucer or a saucer bullet
+# over max_range, 1 if there is nothing within range. The sprites'
+# transformed pointlists are gathered into one array of edges and every ray
+# is tested against every edge at once. Each sprite is moved to its nearest
+# copy around the wrapping stage first, so rays see across the edges.
+class Lidar(ObservationBuilder):
+
+    def __init__(self, rays=32, max_range=400.0, fov=360.0):
+        self.size = rays
+        self.max_range = max_range
+        if fov >= 360.0:
+            offsets = np.arange(rays) * (2 * math.pi / rays)
+        else:
+            offsets = np.linspace(-0.5, 0.5, rays) * math.radians(fov)
+        # Ray angles relative to the ship, the ship points at offset 0
+        self.offsets = offsets
+
+    def obstacles(self, game):
+        sprites = list(game.rockList)
+        if game.saucer is not None:
+            sprites.append(game.saucer)
+            sprites.extend(game.saucer.bullets)
+        return sprites
+
+    def edges(self, game, origin):
+        sprites = self.obstacles(game)
+        if not sprites:
+            return None, None
+
+        pointlists = [sprite.transformedPointlist for sprite in sprites]
+        lengths = np.array([len(pointlist) for pointlist in pointlists])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        points = np.concatenate(pointlists).astype(float)
+
+        # Shift each sprite by whole stage sizes to its copy nearest the ship
+        size = np.array((game.stage.width, game.stage.height), dtype=float)
+        positions = np.array([(sprite.position.x, sprite.position.y) for sprite in sprites])
+        offsets = positions - origin
+        shifts = (offsets + size / 2) % size - size / 2 - offsets
+        points += np.repeat(shifts, lengths, axis=0)
+
+        # Edge i runs from point i to the next one of the same polygon
+        following = np.arange(1, len(points) + 1)
+        following[starts + lengths - 1] = starts
+        ends = points[following]
+
+        # Only keep the edges that may come within max_range of the origin
+        middles = (points + ends) / 2 - origin
+        halves = np.hypot(*(ends - points).T) / 2
+        near = np.hypot(*middles.T) <= self.max_range + halves
+        return points[near], ends[near]
+
+    def features(self, game):
+        ship = game.ship
+        origin = np.array(ship.transformedPointlist[0], dtype=float)
+        starts, ends = self.edges(game, origin)
+        if starts is None or not len(starts):
+            return np.ones(self.size)
+
+        # Same direction convention as the ship: angle 0 points up the screen
+        angles = math.radians(ship.angle) + self.offsets
+        dx = -np.sin(angles)[:, None]
+        dy = -np.cos(angles)[:, None]
+
+        # Solve origin + t d = start + u e for every ray and edge pair
+        ex = (ends[:, 0] - starts[:, 0])[None, :]
+        ey = (ends[:, 1] - starts[:, 1])[None, :]
+        wx = (starts[:, 0] - origin[0])[None, :]
+        wy = (starts[:, 1] - origin[1])[None, :]
+        denominator = dx * ey - dy * ex
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (wx * ey - wy * ex) / denominator
+            u = (wx * dy - wy * dx) / denominator
+        hits = (t >= 0) & (u >= 0) & (u <= 1)
+        t = np.where(hits, t, self.max_range)
+        return np.minimum(t.min(axis=1), self.max_range) / self.max_range
+
+
+# The last stack frames drawn offscreen at width x height, grayscale with no
+# anti-aliasing, oldest first. The frames live in one preallocated uint8
+# buffer (frames) and the state is that buffer flattened and scaled to 0-1,
+# reshape it to shape for a convolutional network. The first frame of an
+# episode fills the whole stack. The stage is transformed again before it is
+# drawn, so the frame shows the sprites after collisions, a reset or a new
+# level rather than as they were when the frame started.
+class Pixels(ObservationBuilder):
+    standalone = True
+
+    def __init__(self, width=84, height=84, stack=4):
+        self.shape = (stack, height, width)
+        self.size = stack * height * width
+        self.frames = np.zeros(self.shape, dtype=np.uint8)
+        self.rasteriser = None
+        self.fresh = True
+
+    def reset(self):
+        self.fresh = True
+
+    def snapshot(self):
+        return self.frames.copy(), self.fresh
+
+    def restore(self, snapshot):
+        frames, self.fresh = snapshot
+        self.frames[:] = frames
+
+    def features(self, game):
+        if self.rasteriser is None:
+            stage = game.stage
+            self.rasteriser = Rasteriser((stage.width, stage.height), self.shape[:0:-1])
+
+        game.stage.transformSprites()
+        frames = self.frames
+        frames[:-1] = frames[1:]
+        self.rasteriser.draw(game.stage.arrays, frames[-1])
+        if self.fresh:
+            frames[:-1] = frames[-1]
+            self.fresh = False
+        return frames.ravel() / np.float32(255)
+
+
+# Build an observation builder from its configuration:
+#   "nearest"   NearestRock, the original 14 feature state
+#   "knearest"  KNearestRocks (k, horizon)
+#   "lidar"     Lidar (rays, max_range, fov)
+#   "pixels"    Pixels (width, height, stack), the whole state
+def make_observation(kind, **options):
+    if kind == "nearest":
+        return NearestRock(**options)
+    if kind == "knearest":
+        return KNearestRocks(**options)
+    if kind == "lidar":
+        return Lidar(**options)
+    if kind == "pixels":
+        return Pixels(**options)
+    raise ValueError(f"unknown observation type {kind!r}")
+
+
+# Length of the whole state for an observation configuration
+def state_size(kind, **options):
+    builder = make_observation(kind, **options)
+    if builder.standalone:
+        return builder.size
+    return SHIP_FEATURES + builder.size + SAUCER_FEATURES
@@ -0,0 +1,210 @@
+import time
+import math
+import multiprocessing as mp
+import numpy as np
+import torch
+from DQN_model import QNetwork
+from Environment import Environment
+
+# Lookahead planning over cloned games. Every decision starts from a snapshot
+# of the real game; each first action is tried with short rollouts, which
+# go on with the QNetwork's epsilon-greedy actions (random actions without a
+# network). A rollout scores the discounted rewards it collects plus, if the
+# ship survives, the discounted value of its last state by the QNetwork. The
+# first actions share the rollouts as a bandit (UCB1, i.e. a one level MCTS)
+# and the one with the best mean return is played.
+#
+# Rollouts run in batches of width games stepped in lockstep, so the network
+# is evaluated once per step for the whole batch. With workers > 0 every
+# round sends a batch to each worker process (only the snapshot, a few KB,
+# goes through the pipe). Rounds go on until the next one wouldn't fit in
+# time_budget seconds, but there is always at least one.
+
+
+# width games to run rollouts in, built like the real game (env_kwargs must
+# give the same frame_skip and observation)
+class RolloutBatch:
+
+    def __init__(self, width, depth, gamma, epsilon, action_size, env_kwargs):
+        env_kwargs = dict(env_kwargs, headless=True)
+        self.envs = [Environment(**env_kwargs) for _ in range(width)]
+        self.depth = depth
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.state_size = self.envs[0].state_size
+        self.action_size = action_size
+
+    # Discounted return of a rollout from root starting with each of the
+    # root_actions (at most width of them)
+    def run(self, root, root_actions, model):
+        n = len(root_actions)
+        envs = self.envs[:n]
+        for env in envs:
+            env.restore(root)
+
+        returns = np.zeros(n)
+        discounts = np.ones(n)
+        alive = np.ones(n, dtype=bool)
+        states = np.zeros((n, self.state_size), dtype=np.float32)
+        actions = np.asarray(root_actions)
+
+        for t in range(self.depth):
+            for i in np.flatnonzero(alive):
+                state, reward, done = envs[i].step(int(actions[i]))
+                states[i] = state
+                returns[i] += discounts[i] * reward
+                if done:
+                    alive[i] = False
+            discounts *= self.gamma
+            if not alive.any():
+                return returns
+            if t < self.depth - 1:
+                actions = self.policy(states, model)
+
+        if model is not None:
+            with torch.inference_mode():
+                values = model(torch.from_numpy(states[alive])).max(dim=1)[0].numpy()
+            returns[alive] += discounts[alive] * values
+        return returns
+
+    def policy(self, states, model):
+        n = len(states)
+        actions = np.random.randint(0, self.action_size, size=n)
+        if model is None:
+            return actions
+
+        with torch.inference_mode():
+            greedy = model(torch.from_numpy(states)).argmax(dim=1).numpy()
+        return np.where(np.random.rand(n) < self.epsilon, actions, greedy)
+
+
+class Planner_agent:
+    # model is a QNetwork (or None for random rollouts), exploration is the
+    # UCB1 constant in reward units. env_kwargs are the Environment settings
+    # of the game being played
+    def __init__(self, model=None, action_size=5, width=5, depth=6, gamma=0.99,
+                 epsilon=0.1, exploration=5.0, time_budget=0.016, workers=0,
+                 **env_kwargs):
+        self.model = model
+        self.action_size = action_size
+        self.exploration = exploration
+        self.time_budget = time_budget
+        self.width = width
+
+        self.batch = None
+        self.conns = []
+        self.workers = []
+        if workers == 0:
+            self.batch = RolloutBatch(width, depth, gamma, epsilon, action_size, env_kwargs)
+        else:
+            weights = model.state_dict() if model is not None else None
+            for _ in range(workers):
+                parent_conn, child_conn = mp.Pipe()
+                process = mp.Process(target=worker,
+                                     args=(child_conn, width, depth, gamma, epsilon,
+                                           action_size, env_kwargs, weights),
+                                     daemon=True)
+                process.start()
+                child_conn.close()
+                self.conns.append(parent_conn)
+                self.workers.append(process)
+
+        # Rollouts and rounds of the last decision
+        self.rollouts = 0
+        self.rounds = 0
+
+    # Send the model's current weights to the workers, e.g. after training
+    def sync_weights(self):
+        weights = self.model.state_dict()
+        for conn in self.conns:
+            conn.send(("weights", weights))
+
+    def act(self, env):
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        root = env.snapshot()
+
+        totals = np.zeros(self.action_size)
+        counts = np.zeros(self.action_size)
+        self.rounds = 0
+        while True:
+            round_start = time.perf_counter()
+            root_actions = self.choose_root_actions(totals, counts)
+            returns = self.run(root, root_actions)
+            np.add.at(totals, root_actions, returns)
+            np.add.at(counts, root_actions, 1)
+            self.rounds += 1
+
+            now = time.perf_counter()
+            if now + (now - round_start) > deadline:
+                break
+
+        self.rollouts = int(counts.sum())
+        means = np.where(counts > 0, totals / np.maximum(counts, 1), -np.inf)
+        return int(np.argmax(means))
+
+    # First actions for the next round: untried ones first, then by UCB1.
+    # Each pick counts as a visit straight away so a round spreads out
+    def choose_root_actions(self, totals, counts):
+        slots = self.width * max(1, len(self.conns))
+        means = totals / np.maximum(counts, 1)
+        counts = counts.copy()
+        chosen = np.zeros(slots, dtype=np.int64)
+        for i in range(slots):
+            if (counts == 0).any():
+                action = int(np.argmin(counts))
+            else:
+                bonus = self.exploration * np.sqrt(math.log(counts.sum()) / counts)
+                action = int(np.argmax(means + bonus))
+            chosen[i] = action
+            counts[action] += 1
+        return chosen
+
+    def run(self, root, root_actions):
+        if self.batch is not None:
+            return self.batch.run(root, root_actions, self.model)
+
+        chunks = np.array_split(root_actions, len(self.conns))
+        for conn, chunk in zip(self.conns, chunks):
+            conn.send(("run", root, chunk))
+        return np.concatenate([conn.recv() for conn in self.conns])
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close",))
+        for process in self.workers:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.kill()
+        for conn in self.conns:
+            conn.close()
+        self.conns = []
+        self.workers = []
+
+
+def worker(conn, width, depth, gamma, epsilon, action_size, env_kwargs, weights):
+    torch.set_num_threads(1)
+    np.random.seed()
+
+    batch = RolloutBatch(width, depth, gamma, epsilon, action_size, env_kwargs)
+    model = None
+    if weights is not None:
+        model = QNetwork(batch.state_size, batch.action_size)
+        model.load_state_dict(weights)
+        model.eval()
+
+    while True:
+        try:
+            command = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if command[0] == "run":
+            _, root, root_actions = command
+            conn.send(batch.run(root, root_actions, model))
+        elif command[0] == "weights" and model is not None:
+            model.load_state_dict(command[1])
+        elif command[0] == "close":
+            break
+
+    conn.close()
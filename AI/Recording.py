@@ -0,0 +1,190 @@
+import random
+import struct
+import zlib
+import numpy as np
+from Environment import Environment
+
+# Episodes are recorded as the seed of the game plus the action taken at
+# every step: the game is deterministic, so that is all it takes to play one
+# again exactly. An archive file is a header followed by one record per
+# episode: seed, frame_skip, reward_pool, number of actions, compressed size
+# and the zlib compressed uint8 actions. A policy repeats itself a lot, so a
+# thousand steps usually take well under a kilobyte.
+
+MAGIC = b"ASTREC2\n"
+RECORD = struct.Struct("<QBBII")
+REWARD_POOLS = ("sum", "max")
+MAX_SEED = 2**64 - 1
+
+
+class Episode:
+
+    def __init__(self, seed, frame_skip, reward_pool, actions):
+        self.seed = seed
+        self.frame_skip = frame_skip
+        self.reward_pool = reward_pool
+        self.actions = actions
+
+    def __len__(self):
+        return len(self.actions)
+
+
+# Logs the episodes of an Environment (see Environment.set_recorder). The
+# actions go into a preallocated array, so recording a step is one store.
+# Finished episodes are kept in episodes and, with a path, appended to that
+# archive as soon as the next one starts or close is called.
+class EpisodeRecorder:
+
+    def __init__(self, path=None, keep=True, capacity=4096):
+        self.path = path
+        self.keep = keep
+        self.episodes = []
+        self.seeds = random.Random()
+        self.file = None
+        if path is not None:
+            self.file = open(path, "a+b")
+            self.file.seek(0)
+            header = self.file.read(len(MAGIC))
+            if not header:
+                self.file.write(MAGIC)
+            elif header != MAGIC:
+                self.file.close()
+                raise ValueError(f"{path} is not an episode archive")
+
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.length = 0
+        self.seed = None
+        self.frame_skip = 1
+        self.reward_pool = "sum"
+
+    def new_seed(self):
+        return self.seeds.getrandbits(63)
+
+    # Seeds are stored as unsigned 64 bit integers, checked here rather than
+    # when the episode is written
+    def start(self, seed, frame_skip, reward_pool):
+        if not 0 <= seed <= MAX_SEED:
+            raise ValueError(f"seed {seed} can't be recorded, it must be in 0 to 2**64 - 1")
+        self.finish()
+        self.seed = seed
+        self.frame_skip = frame_skip
+        self.reward_pool = reward_pool
+        self.length = 0
+
+    def record(self, action):
+        if self.length == len(self.actions):
+            self.actions = np.concatenate((self.actions, np.zeros_like(self.actions)))
+        self.actions[self.length] = action
+        self.length += 1
+
+    # Store the episode being recorded, if it has any steps
+    def finish(self):
+        if self.seed is None or self.length == 0:
+            return None
+        episode = Episode(self.seed, self.frame_skip, self.reward_pool,
+                          self.actions[:self.length].copy())
+        self.seed = None
+        if self.keep:
+            self.episodes.append(episode)
+        if self.file is not None:
+            write_episode(self.file, episode)
+            self.file.flush()
+        return episode
+
+    def close(self):
+        self.finish()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def write_episode(file, episode):
+    data = zlib.compress(episode.actions.tobytes(), 9)
+    file.write(RECORD.pack(episode.seed, episode.frame_skip,
+                           REWARD_POOLS.index(episode.reward_pool),
+                           len(episode.actions), len(data)))
+    file.write(data)
+
+
+def save_episodes(path, episodes):
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for episode in episodes:
+            write_episode(file, episode)
+
+
+def load_episodes(path):
+    episodes = []
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an episode archive")
+        while True:
+            header = file.read(RECORD.size)
+            if len(header) < RECORD.size:
+                break
+            seed, frame_skip, reward_pool, length, size = RECORD.unpack(header)
+            actions = np.frombuffer(zlib.decompress(file.read(size)), dtype=np.uint8)
+            if len(actions) != length:
+                raise ValueError(f"{path} has a corrupt episode")
+            episodes.append(Episode(seed, frame_skip, REWARD_POOLS[reward_pool], actions))
+    return episodes
+
+
+# Plays a recorded episode again, as fast as the simulation goes, headless
+# or drawn. A snapshot is kept every keyframe_every steps on the way, so
+# seek can jump to any step by restoring the nearest keyframe before it and
+# simulating the rest. The seed, frame_skip and reward_pool come from the
+# episode, the extra env_kwargs may only change what is observed (e.g.
+# observation) or drawn.
+class Replayer:
+
+    def __init__(self, episode, headless=True, keyframe_every=250, **env_kwargs):
+        recorded = {"seed", "frame_skip", "reward_pool"}.intersection(env_kwargs)
+        if recorded:
+            raise ValueError(f"{', '.join(sorted(recorded))} can't be given, the episode sets them")
+        self.episode = episode
+        self.keyframe_every = keyframe_every
+        self.env = Environment(headless=headless, frame_skip=episode.frame_skip,
+                               reward_pool=episode.reward_pool, seed=episode.seed,
+                               **env_kwargs)
+        self.keyframes = {}
+        self.rewind()
+
+    # Back to the start of the episode
+    def rewind(self):
+        self.state = self.env.reset(seed=self.episode.seed)
+        self.position = 0
+        self.reward = 0.0
+        self.done = False
+        self.keyframes[0] = self.keyframe()
+
+    def keyframe(self):
+        return self.env.snapshot(), self.state
+
+    # Do the next recorded action, returns (state, reward, done)
+    def step(self):
+        action = int(self.episode.actions[self.position])
+        self.state, self.reward, self.done = self.env.step(action)
+        self.position += 1
+        if self.position % self.keyframe_every == 0 and self.position not in self.keyframes:
+            self.keyframes[self.position] = self.keyframe()
+        return self.state, self.reward, self.done
+
+    # Go to just after step position (0 is the start of the episode)
+    def seek(self, position):
+        if not 0 <= position <= len(self.episode):
+            raise IndexError(f"step {position} is outside the episode")
+
+        keyframe = max(k for k in self.keyframes if k <= position)
+        if position < self.position or keyframe > self.position:
+            snapshot, self.state = self.keyframes[keyframe]
+            self.env.restore(snapshot)
+            self.position = keyframe
+        while self.position < position:
+            self.step()
+        return self.state
+
+    # Replay the rest of the episode, yielding (state, reward, done) per step
+    def play(self):
+        while self.position < len(self.episode):
+            yield self.step()
@@ -1,17 +1,265 @@
-import random
+import numpy as np
+import torch
 from collections import deque
 
+# Preallocated ring buffer of transitions stored as a struct of arrays.
+# States are float32 rows of an observation ring and each transition only
+# keeps the index of its state and next state, so when transitions come in
+# order (the next state of one is the state of the next) every observation is
+# stored once. The observation ring holds 2 * capacity + 2 rows, enough for
+# the last capacity transitions even if none of them follow on.
+#
+# All the replay buffers share one interface: push(experience, stream),
+# sample(n) returning (states, actions, rewards, next_states, dones, weights,
+# indexes), update_priorities(indexes, td_errors) and len(). stream tells the
+# games apart when the transitions of several are interleaved (only the
+# n-step buffer needs it), weights is None when the samples need no
+# importance sampling correction, and discount is the factor applied to the
+# bootstrapped value of the next state.
+#
+# sample() fills preallocated batch arrays and returns torch tensors sharing
+# their memory, so the returned batch is only valid until the next call.
 class ReplayBuffer:
-    def __init__(self, capacity=50000):
-        self.buffer = deque(maxlen=capacity)
+    def __init__(self, capacity=50000, state_size=14, gamma=0.99):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.discount = gamma
 
-    def push(self, experience):
-        self.buffer.append(experience)
+        self.observations = np.zeros((2 * capacity + 2, state_size), dtype=np.float32)
+        self.state_index = np.zeros(capacity, dtype=np.int64)
+        self.next_index = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+
+        self.position = 0       # next transition slot
+        self.size = 0
+        self.obs_position = 0   # next observation row
+        self.last_next = -1     # row of the last next state pushed
+
+        self.batch_size = 0
+
+    def add_observation(self, observation):
+        index = self.obs_position
+        self.observations[index] = observation
+        self.obs_position = (index + 1) % len(self.observations)
+        return index
+
+    def push(self, experience, stream=0):
+        state, action, reward, next_state, done = experience
+
+        # Compared as stored, the environment gives float64 states
+        last = self.last_next
+        if last >= 0 and np.array_equal(self.observations[last], np.asarray(state, np.float32)):
+            state_index = last
+        else:
+            state_index = self.add_observation(state)
+        next_index = self.add_observation(next_state)
+        self.last_next = next_index
+
+        i = self.position
+        self.state_index[i] = state_index
+        self.next_index[i] = next_index
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def allocate_batch(self, batch_size):
+        self.batch_size = batch_size
+        self.batch_states = np.zeros((batch_size, self.state_size), dtype=np.float32)
+        self.batch_next_states = np.zeros_like(self.batch_states)
+        self.batch_actions = np.zeros(batch_size, dtype=np.int64)
+        self.batch_rewards = np.zeros(batch_size, dtype=np.float32)
+        self.batch_dones = np.zeros(batch_size, dtype=np.float32)
+        self.batch_tensors = tuple(torch.from_numpy(a) for a in (
+            self.batch_states, self.batch_actions, self.batch_rewards,
+            self.batch_next_states, self.batch_dones))
+
+    # Gather the transitions at indexes into the batch arrays
+    def gather(self, indexes):
+        if len(indexes) != self.batch_size:
+            self.allocate_batch(len(indexes))
+
+        np.take(self.observations, self.state_index[indexes], axis=0, out=self.batch_states)
+        np.take(self.observations, self.next_index[indexes], axis=0, out=self.batch_next_states)
+        self.batch_actions[:] = self.actions[indexes]
+        self.batch_rewards[:] = self.rewards[indexes]
+        self.batch_dones[:] = self.dones[indexes]
+        return self.batch_tensors
+
+    # Uniform sample, every transition is equally likely
+    def sample(self, batch_size):
+        indexes = np.random.randint(0, self.size, size=batch_size)
+        return self.gather(indexes) + (None, indexes)
+
+    def update_priorities(self, indexes, td_errors):
+        pass
+
+    def __len__(self):
+        return self.size
+
+
+# Binary tree where every node holds the sum of its children, the leaves are
+# the priorities. Finding the leaf for a cumulative priority and updating a
+# leaf are both O(log n) and are done for a whole batch at once.
+class SumTree:
+    def __init__(self, capacity):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, indexes, priorities):
+        nodes = np.asarray(indexes) + self.leaves
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+
+    # Leaf indexes holding the given cumulative priorities
+    def find(self, values):
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves:
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values -= left * right
+            nodes = 2 * nodes + right
+        return nodes - self.leaves
+
+    def get(self, indexes):
+        return self.tree[np.asarray(indexes) + self.leaves]
+
+
+# Prioritized experience replay (Schaul et al.) on top of the ring buffer.
+# Transitions are sampled with probability p^alpha / sum(p^alpha), where p is
+# their last absolute TD error, and come with importance sampling weights
+# (N * P)^-beta / max(weight) to correct the bias. beta is annealed linearly
+# from beta_start to 1 over beta_steps calls to sample.
+class PrioritizedReplayBuffer(ReplayBuffer):
+    def __init__(self, capacity=50000, state_size=14, gamma=0.99, alpha=0.6,
+                 beta_start=0.4, beta_steps=100000, epsilon=1e-5):
+        ReplayBuffer.__init__(self, capacity, state_size, gamma)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.beta_start = beta_start
+        self.beta_steps = beta_steps
+        self.beta = beta_start
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.sample_count = 0
+
+    def push(self, experience, stream=0):
+        index = self.position
+        ReplayBuffer.push(self, experience, stream)
+        # New transitions get the highest priority so they are seen at least once
+        self.tree.update([index], [self.max_priority ** self.alpha])
+
+    def anneal_beta(self):
+        fraction = min(1.0, self.sample_count / self.beta_steps)
+        self.beta = self.beta_start + fraction * (1.0 - self.beta_start)
+
+    # Stratified sample, pass indexes back to update_priorities
+    def sample(self, batch_size):
+        self.sample_count += 1
+        self.anneal_beta()
+
+        total = self.tree.total()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + np.random.rand(batch_size)) * segment
+        indexes = np.minimum(self.tree.find(values), self.size - 1)
+
+        batch = self.gather(indexes)
+
+        probabilities = self.tree.get(indexes) / total
+        weights = (self.size * probabilities) ** -self.beta
+        self.batch_weights_array[:] = weights / weights.max()
+        return batch + (self.batch_weights, indexes)
+
+    def allocate_batch(self, batch_size):
+        ReplayBuffer.allocate_batch(self, batch_size)
+        self.batch_weights_array = np.zeros(batch_size, dtype=np.float32)
+        self.batch_weights = torch.from_numpy(self.batch_weights_array)
+
+    def update_priorities(self, indexes, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update(indexes, priorities ** self.alpha)
+
+
+# n-step returns on top of another buffer. Transitions are held back until n
+# of them are known and then stored as (s_t, a_t, r_t + ... + gamma^(n-1)
+# r_(t+n-1), s_(t+n), done), so the target bootstraps with gamma^n. At the end
+# of an episode the shorter returns are stored too. Each stream has its own
+# pending transitions, so interleaved games don't cut each other short. A
+# truncated episode (the next push of a stream doesn't follow on from its
+# last one) drops its pending transitions since they have no n-th state to
+# bootstrap from.
+class NStepReplayBuffer:
+    def __init__(self, buffer, n=3, gamma=0.99):
+        self.buffer = buffer
+        self.n = n
+        self.gamma = gamma
+        self.discount = gamma ** n
+        self.capacity = buffer.capacity
+        self.pending = {}
+
+    def push(self, experience, stream=0):
+        state, action, reward, next_state, done = experience
+        pending = self.pending.get(stream)
+        if pending is None:
+            pending = self.pending[stream] = deque()
+        elif pending and not np.array_equal(pending[-1][3], state):
+            pending.clear()
+
+        pending.append(experience)
+        if done:
+            while pending:
+                self.push_oldest(pending, stream)
+        elif len(pending) == self.n:
+            self.push_oldest(pending, stream)
+
+    def push_oldest(self, pending, stream):
+        ret = 0.0
+        for i, (_, _, reward, _, _) in enumerate(pending):
+            ret += (self.gamma ** i) * reward
+        state, action = pending[0][0], pending[0][1]
+        next_state, done = pending[-1][3], pending[-1][4]
+        pending.popleft()
+        self.buffer.push((state, action, ret, next_state, done), stream)
 
     def sample(self, batch_size):
-        batch = random.sample(self.buffer, batch_size)
-        states, actions, rewards, next_states, dones = zip(*batch)
-        return states, actions, rewards, next_states, dones
+        return self.buffer.sample(batch_size)
+
+    def update_priorities(self, indexes, td_errors):
+        self.buffer.update_priorities(indexes, td_errors)
 
     def __len__(self):
         return len(self.buffer)
+
+
+# Build a replay buffer from its configuration:
+#   "uniform"      ReplayBuffer
+#   "prioritized"  PrioritizedReplayBuffer (alpha, beta_start, beta_steps...)
+#   "nstep"        NStepReplayBuffer (n) over a uniform buffer, or over a
+#                  prioritized one with prioritized=True
+def make_replay(kind, capacity, state_size, gamma, **options):
+    if kind == "uniform":
+        return ReplayBuffer(capacity, state_size, gamma)
+    if kind == "prioritized":
+        return PrioritizedReplayBuffer(capacity, state_size, gamma, **options)
+    if kind == "nstep":
+        n = options.pop("n", 3)
+        base = "prioritized" if options.pop("prioritized", False) else "uniform"
+        buffer = make_replay(base, capacity, state_size, gamma, **options)
+        return NStepReplayBuffer(buffer, n, gamma)
+    raise ValueError(f"unknown replay type {kind!r}")
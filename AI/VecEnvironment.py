@@ -0,0 +1,49 @@
+import numpy as np
+from Environment import Environment
+
+# Steps num_envs independent headless games together.
+# States come back stacked as a (num_envs, state_size) float32 array so the
+# policy can be evaluated once for the whole batch. Finished games are reset
+# straight away: their row in the returned states is the first state of the
+# new episode and the last state of the finished one is kept in final_states.
+# With a seed, game i is seeded with seed + i.
+class VecEnvironment:
+
+    def __init__(self, num_envs, seed=None, **env_kwargs):
+        env_kwargs.setdefault("headless", True)
+        self.envs = [Environment(seed=env_seed(seed, i), **env_kwargs)
+                     for i in range(num_envs)]
+        self.num_envs = num_envs
+
+        state = self.envs[0].get_state()
+        self.state_size = len(state)
+
+        self.states = np.zeros((num_envs, self.state_size), dtype=np.float32)
+        self.final_states = np.zeros_like(self.states)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            self.states[i] = env.reset()
+        return self.states.copy()
+
+    def step(self, actions):
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            state, reward, done = env.step(int(action))
+            self.rewards[i] = reward
+            self.dones[i] = done
+            if done:
+                self.final_states[i] = state
+                state = env.reset()
+            self.states[i] = state
+
+        return self.states.copy(), self.rewards.copy(), self.dones.copy()
+
+    def __len__(self):
+        return self.num_envs
+
+
+# Seed of game i of a batch seeded with seed (None for an unseeded batch)
+def env_seed(seed, i):
+    return None if seed is None else seed + i
@@ -0,0 +1,59 @@
+import time
+import numpy as np
+import torch
+from Environment import Environment
+from DQN_model import QNetwork
+from Planner_agent import Planner_agent
+
+# Play with the lookahead planner, using the trained QNetwork (if there is
+# one) for the rollouts and to value their last states
+
+EPISODES = 10
+MAX_STEPS = 2000
+
+INPUT_SIZE = 14
+ACTION_SIZE = 5
+
+HEADLESS = False
+
+# Planning time per step in seconds, and processes running rollouts (0 to
+# run them here). More workers than CPU cores only slows every step down
+TIME_BUDGET = 0.016
+WORKERS = 0
+
+env = Environment(headless=HEADLESS)
+
+model = QNetwork(INPUT_SIZE, ACTION_SIZE)
+try:
+    checkpoint = torch.load("dqn_model.pth")
+    model.load_state_dict(checkpoint["model_state"])
+    print("Modelo cargado correctamente.")
+except Exception:
+    model = None
+    print("No hay modelo previo. Rollouts aleatorios.")
+if model is not None:
+    model.eval()
+
+planner = Planner_agent(model, ACTION_SIZE, time_budget=TIME_BUDGET, workers=WORKERS)
+
+try:
+    for episode in range(EPISODES):
+        state = env.reset()
+        total_reward = 0
+        plan_times = []
+
+        for step in range(MAX_STEPS):
+            start = time.perf_counter()
+            action = planner.act(env)
+            plan_times.append(time.perf_counter() - start)
+
+            state, reward, done = env.step(action)
+            total_reward += reward
+            if done:
+                break
+
+        print(f"Episode {episode} | Reward: {total_reward:.2f} | Steps: {step + 1}"
+              f" | Plan ms: {1000 * np.mean(plan_times):.1f} (max {1000 * np.max(plan_times):.1f})"
+              f" | Rollouts/step: {planner.rollouts}")
+finally:
+    planner.close()
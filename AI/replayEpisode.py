@@ -0,0 +1,34 @@
+import sys
+import pygame
+from Recording import load_episodes, Replayer
+
+# Watch a recorded episode (see RECORD_EPISODES in trainDQN.py):
+#   python replayEpisode.py episodes.rec [episode number] [first step]
+# Negative episode numbers count from the end, -1 (the default) is the last.
+
+FPS = 60                 # 0 to replay as fast as possible
+
+path = sys.argv[1] if len(sys.argv) > 1 else "episodes.rec"
+number = int(sys.argv[2]) if len(sys.argv) > 2 else -1
+first = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+episodes = load_episodes(path)
+episode = episodes[number]
+print(f"Episode {number % len(episodes)} of {len(episodes)}: seed {episode.seed}, "
+      f"{len(episode)} steps")
+
+replayer = Replayer(episode, headless=False)
+
+# Jump to the first step without drawing the way there
+replayer.env.set_rendering(False)
+replayer.seek(first)
+replayer.env.set_rendering(True)
+
+clock = pygame.time.Clock()
+total_reward = 0
+for state, reward, done in replayer.play():
+    total_reward += reward
+    if FPS:
+        clock.tick(FPS)
+
+print(f"Reward from step {first}: {total_reward:.2f}")
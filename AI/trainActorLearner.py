@@ -0,0 +1,198 @@
+import time
+import queue
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from DQN_agent import DQN_agent
+from DQN_model import QNetwork
+from Observation import state_size
+
+# Actor/learner training: actor processes play headless games with a copy of
+# the QNetwork and send their transitions to the learner (this process), which
+# keeps the replay buffer and does the gradient updates. Simulation and
+# learning run at the same time instead of taking turns.
+
+TOTAL_STEPS = 2_000_000       # environment steps over all the actors
+
+# How the rocks are described: "nearest", "knearest", "lidar" or "pixels" (see Observation.py)
+OBSERVATION = "nearest"
+OBSERVATION_OPTIONS = {}
+
+INPUT_SIZE = state_size(OBSERVATION, **OBSERVATION_OPTIONS)
+ACTION_SIZE = 5
+
+NUM_ACTORS = 4
+ENVS_PER_ACTOR = 8            # games stepped together by each actor
+CHUNK_STEPS = 32              # actor steps per batch of transitions sent
+
+# Gradient updates per environment step received (0.25 = one every 4 steps)
+UPDATES_PER_STEP = 0.25
+# Learner updates between weight syncs to the actors
+SYNC_EVERY = 100
+
+# Actor i explores with epsilon BASE_EPSILON^(1 + 7i / (NUM_ACTORS - 1)),
+# so some actors explore a lot and others mostly exploit (as in Ape-X)
+BASE_EPSILON = 0.4
+
+REPLAY = "uniform"
+REPLAY_OPTIONS = {}
+
+# Target network: "soft" (Polyak, tau 0.01) or "hard" copy, every N updates
+TARGET_UPDATE = "soft"
+TARGET_UPDATE_EVERY = 1
+
+REPORT_EVERY = 10.0           # seconds
+
+
+def actor_epsilon(index, num_actors):
+    if num_actors == 1:
+        return BASE_EPSILON
+    return BASE_EPSILON ** (1 + 7 * index / (num_actors - 1))
+
+
+def actor(index, shared_model, weights_version, env_steps, transitions, episodes, stop):
+    # Imported here so the learner never creates a game
+    from VecEnvironment import VecEnvironment
+
+    torch.set_num_threads(1)
+    np.random.seed()
+
+    envs = VecEnvironment(ENVS_PER_ACTOR, observation=OBSERVATION,
+                          observation_options=OBSERVATION_OPTIONS)
+    agent = DQN_agent(INPUT_SIZE, ACTION_SIZE, replay_capacity=1)
+    agent.epsilon = actor_epsilon(index, NUM_ACTORS)
+
+    version = -1
+    states = envs.reset()
+    episode_rewards = np.zeros(ENVS_PER_ACTOR)
+
+    shape = (CHUNK_STEPS, ENVS_PER_ACTOR)
+    chunk_states = np.zeros(shape + (INPUT_SIZE,), dtype=np.float32)
+    chunk_next_states = np.zeros_like(chunk_states)
+    chunk_actions = np.zeros(shape, dtype=np.uint8)
+    chunk_rewards = np.zeros(shape, dtype=np.float32)
+    chunk_dones = np.zeros(shape, dtype=bool)
+    # Stream of every transition sent, one per game of every actor, so the
+    # learner keeps the games apart (e.g. for the n-step returns)
+    chunk_streams = np.repeat(index * ENVS_PER_ACTOR + np.arange(ENVS_PER_ACTOR), CHUNK_STEPS)
+
+    while not stop.is_set():
+        if weights_version.value != version:
+            version = weights_version.value
+            agent.model.load_state_dict(shared_model.state_dict())
+
+        for t in range(CHUNK_STEPS):
+            actions = agent.act_batch(states)
+            next_states, rewards, dones = envs.step(actions)
+
+            chunk_states[t] = states
+            chunk_actions[t] = actions
+            chunk_rewards[t] = rewards
+            chunk_dones[t] = dones
+            # Finished games have already been reset, keep their last state
+            chunk_next_states[t] = np.where(dones[:, None], envs.final_states, next_states)
+
+            episode_rewards += rewards
+            for i in np.flatnonzero(dones):
+                episodes.put(episode_rewards[i])
+                episode_rewards[i] = 0.0
+            states = next_states
+
+        # Transitions of each game in order, so the replay can share states
+        transitions.put(tuple(a.swapaxes(0, 1).reshape((-1,) + a.shape[2:])
+                              for a in (chunk_states, chunk_actions, chunk_rewards,
+                                        chunk_next_states, chunk_dones))
+                        + (chunk_streams,))
+        with env_steps.get_lock():
+            env_steps.value += CHUNK_STEPS * ENVS_PER_ACTOR
+
+
+def learn():
+    agent = DQN_agent(INPUT_SIZE, ACTION_SIZE, REPLAY, REPLAY_OPTIONS,
+                      target_update=TARGET_UPDATE, target_update_every=TARGET_UPDATE_EVERY)
+    try:
+        checkpoint = torch.load("dqn_model.pth")
+        agent.model.load_state_dict(checkpoint["model_state"])
+        agent.target_model.load_state_dict(checkpoint["target_state"])
+        print("Modelo cargado correctamente.")
+    except Exception:
+        print("No hay modelo previo. Comenzando desde cero.")
+
+    # Weights the actors copy from, refreshed every SYNC_EVERY updates
+    shared_model = QNetwork(INPUT_SIZE, ACTION_SIZE)
+    shared_model.load_state_dict(agent.model.state_dict())
+    shared_model.share_memory()
+
+    weights_version = mp.Value("i", 0)
+    env_steps = mp.Value("q", 0)
+    transitions = mp.Queue(maxsize=4 * NUM_ACTORS)
+    episodes = mp.Queue()
+    stop = mp.Event()
+
+    actors = [mp.Process(target=actor,
+                         args=(i, shared_model, weights_version, env_steps,
+                               transitions, episodes, stop),
+                         daemon=True)
+              for i in range(NUM_ACTORS)]
+    for process in actors:
+        process.start()
+
+    steps_received = 0
+    updates = 0
+    recent_rewards = []
+    report_time = time.time()
+    report_steps = report_updates = 0
+
+    try:
+        while steps_received < TOTAL_STEPS:
+            # Take in what the actors sent, wait for them if we are ahead
+            ahead = updates >= UPDATES_PER_STEP * steps_received or len(agent.replay) < agent.batch_size
+            try:
+                chunk = transitions.get(timeout=1.0) if ahead else transitions.get_nowait()
+                for transition in zip(*chunk):
+                    agent.remember(*transition)
+                steps_received += len(chunk[0])
+            except queue.Empty:
+                pass
+
+            while updates < UPDATES_PER_STEP * steps_received and len(agent.replay) >= agent.batch_size:
+                agent.train_step()
+                updates += 1
+                if updates % SYNC_EVERY == 0:
+                    shared_model.load_state_dict(agent.model.state_dict())
+                    with weights_version.get_lock():
+                        weights_version.value += 1
+
+            while not episodes.empty():
+                recent_rewards.append(episodes.get())
+
+            elapsed = time.time() - report_time
+            if elapsed >= REPORT_EVERY:
+                mean_reward = np.mean(recent_rewards) if recent_rewards else float("nan")
+                stats = agent.replay_stats()
+                print(f"Steps {steps_received} | Env steps/s: {(env_steps.value - report_steps) / elapsed:.0f}"
+                      f" | Updates/s: {(updates - report_updates) / elapsed:.1f}"
+                      f" | Episodes: {len(recent_rewards)} | Mean reward: {mean_reward:.2f}"
+                      f" | Replay: {stats['fill']:.1%}")
+                recent_rewards = []
+                report_time = time.time()
+                report_steps = env_steps.value
+                report_updates = updates
+    finally:
+        stop.set()
+        for process in actors:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.kill()
+
+        torch.save({
+            "model_state": agent.model.state_dict(),
+            "target_state": agent.target_model.state_dict(),
+            "epsilon": agent.epsilon
+        }, "dqn_model.pth")
+        print("Modelo guardado.")
+
+
+if __name__ == "__main__":
+    mp.set_start_method("spawn")
+    learn()
@@ -1,17 +1,58 @@
 from Environment import Environment
+from Observation import state_size
+from Recording import EpisodeRecorder
 from DQN_agent import DQN_agent
 import numpy as np
 import torch
+import signal
 
 EPISODES = 3000
 MAX_STEPS = 2000
 
-INPUT_SIZE = 14
+# How the rocks are described: "nearest" (the nearest one), "knearest"
+# (options e.g. {"k": 4}), "lidar" (e.g. {"rays": 32}) or "pixels" (stacked
+# low resolution frames, e.g. {"width": 84, "height": 84, "stack": 4})
+OBSERVATION = "nearest"
+OBSERVATION_OPTIONS = {}
+
+INPUT_SIZE = state_size(OBSERVATION, **OBSERVATION_OPTIONS)
 ACTION_SIZE = 5
 
-env = Environment()
+# Train without a window (no display needed, runs much faster)
+HEADLESS = False
+
+# Draw 1 in every RENDER_EVERY frames of 1 in every RENDER_EPISODES_EVERY
+# episodes. Press r in the window or send SIGUSR1 to toggle drawing
+RENDER_EVERY = 1
+RENDER_EPISODES_EVERY = 1
+
+# Repeat each action for FRAME_SKIP frames, summing their rewards
+FRAME_SKIP = 1
+
+env = Environment(headless=HEADLESS, render_every=RENDER_EVERY, frame_skip=FRAME_SKIP,
+                  observation=OBSERVATION, observation_options=OBSERVATION_OPTIONS)
+
+if hasattr(signal, "SIGUSR1"):
+    signal.signal(signal.SIGUSR1, lambda signum, frame: env.game.toggleRendering())
 
-agent = DQN_agent(INPUT_SIZE, ACTION_SIZE)
+# Replay buffer: "uniform", "prioritized" or "nstep" (options e.g. {"n": 3})
+REPLAY = "uniform"
+REPLAY_OPTIONS = {}
+
+# Target network: "soft" (Polyak, tau 0.01) or "hard" copy, every N updates
+TARGET_UPDATE = "soft"
+TARGET_UPDATE_EVERY = 1
+
+# Record the seed and actions of every episode to this file to watch them
+# later with replayEpisode.py (None to not record)
+RECORD_EPISODES = None
+
+if RECORD_EPISODES is not None:
+    recorder = EpisodeRecorder(RECORD_EPISODES, keep=False)
+    env.set_recorder(recorder)
+
+agent = DQN_agent(INPUT_SIZE, ACTION_SIZE, REPLAY, REPLAY_OPTIONS,
+                  target_update=TARGET_UPDATE, target_update_every=TARGET_UPDATE_EVERY)
 
 try:
     checkpoint = torch.load("dqn_model.pth")
@@ -24,6 +65,7 @@ except:
 
 for episode in range(EPISODES):
 
+    env.set_rendering(episode % RENDER_EPISODES_EVERY == 0)
     state = env.reset()
     total_reward = 0
 
@@ -34,7 +76,7 @@ for episode in range(EPISODES):
         env.game.current_state = state
         next_state, reward, done = env.step(action)
 
-        agent.replay.push((state, action, reward, next_state, done))
+        agent.remember(state, action, reward, next_state, done)
         agent.train_step()
 
         state = next_state
@@ -45,7 +87,9 @@ for episode in range(EPISODES):
 
     agent.update_epsilon()
 
-    print(f"Episode {episode}  | Reward: {total_reward:.2f} | Epsilon: {agent.epsilon:.3f}")
+    stats = agent.replay_stats()
+    print(f"Episode {episode}  | Reward: {total_reward:.2f} | Epsilon: {agent.epsilon:.3f}"
+          f" | Replay: {stats['fill']:.1%} | Samples/s: {stats['samples_per_sec']:.0f}")
 
     if episode % 20 == 0:
         torch.save({
@@ -54,3 +98,6 @@ for episode in range(EPISODES):
             "epsilon": agent.epsilon
         }, "dqn_model.pth")
         print("Modelo guardado.")
+
+if RECORD_EPISODES is not None:
+    recorder.close()
@@ -27,6 +27,7 @@
 # p for pause
 # j for toggle showing FPS
 # o for frame advance whilst paused
+# r for toggle rendering (the simulation keeps running)
 
 import pygame
 import sys
@@ -34,85 +35,89 @@ import os
 import random
 from pygame.locals import *
 from .util.vectorsprites import *
+from .util.spatialhash import SpatialHash
 from .ship import *
 from .stage import *
 from .badies import *
 from .shooter import *
 from .soundManager import *
+from .textCache import *
+from .features import FrameFeatures
+from .snapshot import takeSnapshot, restoreSnapshot
 
 class Asteroids():
 
     explodingTtl = 180
     
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, renderEvery=1, seed=None):
         self.headless = headless
+
+        # Everything random in the game comes from this generator, so two
+        # games with the same seed and the same inputs play out the same
+        self.rng = random.Random(seed)
+        self.rockShape = 1
+
+        # Rendering can be throttled to 1 in every renderEvery frames (0 for
+        # never), switched off with renderEnabled (e.g. for all but the
+        # evaluation episodes) and toggled at runtime with toggleRendering,
+        # which overrides renderEnabled. Skipped frames only run the simulation
+        self.renderEvery = renderEvery
+        self.renderEnabled = True
+        self.renderOverride = None
         
         self.debug_mode = True  # debug visual
         self.last_action = "none"
         self.last_reward = 0.0
-        self.last_angle_diff = 0.0
+        self.features = None
+        self.hud = None
+        self.hud_lines = None
         
-        pygame.init()
-        pygame.font.init() 
-
         if not headless:
             # normal windows
-            self.stage = Stage('Atari Asteroids', (1200, 630))
+            pygame.init()
+            pygame.font.init()
+            self.stage = Stage('Atari Asteroids', (1200, 630), self.rng)
         else:
-            # without windows (simulator)
-            pygame.display.init()
-            self.stage = type('StageMock', (), {})()
-            self.stage.width = 1200
-            self.stage.height = 630
-            self.stage.screen = pygame.Surface((1, 1))
-            self.stage.spriteList = []
-            self.stage.addSprite = lambda *args, **kwargs: None
-            self.stage.removeSprite = lambda *args, **kwargs: None
-            self.stage.moveSprites = lambda *args, **kwargs: None
-            self.stage.drawSprites = lambda *args, **kwargs: None
+            # without windows (simulator), same physics but nothing is drawn
+            self.stage = HeadlessStage((1200, 630), self.rng)
 
         # --- other atributes ---
         self.paused = False
         self.showingFPS = False
         self.frameAdvance = False
         self.gameState = "playing"
-        self.rockList = []
         self.createRocks(1)
         self.saucer = None
         self.secondsCount = 1
         self.score = 0
         self.ship = None
         self.lives = 0
+        self.collisionGrid = SpatialHash(self.stage.width, self.stage.height)
+
 
+    # The rocks on the stage, kept in the stage's rock registry
+    @property
+    def rockList(self):
+        return self.stage.rocks
 
     def initialiseGame(self):
         self.gameState = 'playing'
 
-        # Remove old rocks
-        for sprite in list(self.rockList):
-            if sprite in self.stage.spriteList:
-                self.stage.removeSprite(sprite)
-
-        # Remove old saucer
-        if self.saucer is not None:
-            self.killSaucer()
-
-        # Remove any existing ship & its jet (defensive clean-up)
-        if self.ship is not None:
-            if getattr(self.ship, "thrustJet", None) in self.stage.spriteList:
-                self.stage.removeSprite(self.ship.thrustJet)
-            if self.ship in self.stage.spriteList:
-                self.stage.removeSprite(self.ship)
-
-        # Optionally remove any stray debris/bullets that may linger
-        # (depends on your Stage implementation; if you tag sprites by type, filter them here)
+        # Remove every sprite of the last game (rocks, saucer, ship, debris,
+        # bullets and lives icons), so that a new game only depends on the
+        # random generator (e.g. to replay it)
+        for sprite in self.stage.spriteList:
+            self.stage.removeSprite(sprite)
+        self.saucer = None
+        self.lives = 0
 
         self.startLives = 1
         self.score = 0
-        self.rockList = []
         self.numRocks = 3
         self.nextLife = 10000
         self.secondsCount = 1
+        self.features = None
+        self.rockShape = 1
 
         self.createNewShip()
         self.createLivesList()
@@ -125,7 +130,7 @@ class Asteroids():
             # remove debris of the old ship if any
             for debris in getattr(self.ship, "shipDebrisList", []):
                 if debris in self.stage.spriteList:
-                    self.stage.spriteList.remove(debris)
+                    self.stage.removeSprite(debris)
             # remove old ship and jet if still present
             if self.ship in self.stage.spriteList:
                 self.stage.removeSprite(self.ship)
@@ -155,45 +160,99 @@ class Asteroids():
 
     def createRocks(self, numRocks):
         for _ in range(0, numRocks):
-            position = Vector2d(random.randrange(-10, 10),
-                                random.randrange(-10, 10))
+            position = Vector2d(self.rng.randrange(-10, 10),
+                                self.rng.randrange(-10, 10))
 
-            newRock = Rock(self.stage, position, Rock.largeRockType)
+            newRock = Rock(self.stage, position, Rock.largeRockType,
+                           self.nextRockShape())
             self.stage.addSprite(newRock)
-            self.rockList.append(newRock)
+
+    # Rocks take the four shapes in turn
+    def nextRockShape(self):
+        shape = self.rockShape
+        self.rockShape = shape % 4 + 1
+        return shape
+
+    # Restart the random generator, e.g. before a new game to replay it
+    def seed(self, seed):
+        self.rng.seed(seed)
 
     def update_one_frame(self):
         self.secondsCount += 1
-        self.input(pygame.event.get())
-        self.stage.screen.fill((10, 10, 10))
+        # In headless mode there is no window, so no events, keys or drawing
+        render = self.isRendering()
+
+        if not self.headless:
+            self.input(pygame.event.get())
+        if render:
+            self.stage.screen.fill((10, 10, 10))
         self.stage.moveSprites()
-        self.stage.drawSprites()
-        
-        self.debug_draw()
-        
-        self.draw_line_to_enemy_ship()
-        
+        self.stage.transformSprites()
+        self.features = None
+
+        if render:
+            self.stage.drawSprites()
+            self.debug_draw()
+            self.draw_line_to_enemy_ship()
+
         self.doSaucerLogic()
-        self.displayScore()
-        if self.showingFPS:
-            self.displayFps()
+        if render:
+            self.displayScore()
+            if self.showingFPS:
+                self.displayFps()
         self.checkScore()
-    
 
         if self.gameState == 'playing':
             self.playing()
         elif self.gameState == 'exploding':
             self.initialiseGame()
-        else:
+        elif render:
             self.displayText()
-            
-        pygame.display.flip()
+        # Collisions, a new level or a new game changed the sprites again
+        self.features = None
+
+        if render:
+            pygame.display.flip()
+
+    # Features of the current frame, only computed once however many times
+    # they are asked for (observation, reward and debug overlay)
+    def frameFeatures(self):
+        if self.features is None:
+            self.features = FrameFeatures(self)
+        return self.features
+
+    # Capture the whole simulation (sprites, score, lives, rng state) as a
+    # GameSnapshot, to be taken between frames
+    def snapshot(self):
+        return takeSnapshot(self)
+
+    # Put the game back as it was when the snapshot was taken
+    def restore(self, snapshot):
+        restoreSnapshot(self, snapshot)
+        self.features = None
+
+    def isRendering(self):
+        if self.headless or self.renderEvery <= 0:
+            return False
+
+        enabled = self.renderEnabled
+        if self.renderOverride is not None:
+            enabled = self.renderOverride
+        return enabled and self.secondsCount % self.renderEvery == 0
+
+    # Switch the rendering on or off whatever renderEnabled says (r key)
+    def toggleRendering(self):
+        enabled = self.renderEnabled
+        if self.renderOverride is not None:
+            enabled = self.renderOverride
+        self.renderOverride = not enabled
 
     def playing(self):
         if self.lives == 0:
             self.gameState = 'attract_mode'
         else:
-            self.processKeys()
+            if not self.headless:
+                self.processKeys()
             self.checkCollisions()
             if len(self.rockList) == 0:
                 self.levelUp()
@@ -205,7 +264,7 @@ class Asteroids():
 
         # Create a saucer
         if self.secondsCount % 2000 == 0 and self.saucer is None:
-            randVal = random.randrange(0, 10)
+            randVal = self.rng.randrange(0, 10)
             if randVal <= 3:
                 self.saucer = Saucer(
                     self.stage, Saucer.smallSaucerType, self.ship)
@@ -218,7 +277,7 @@ class Asteroids():
         self.explodingCount += 1
         if self.explodingCount > self.explodingTtl:
             self.gameState = 'playing'
-            [self.stage.spriteList.remove(debris)
+            [self.stage.removeSprite(debris)
              for debris in self.ship.shipDebrisList]
             self.ship.shipDebrisList = []
             self.ship.visible = False
@@ -230,39 +289,33 @@ class Asteroids():
 
     # move this kack somewhere else!
     def displayText(self):
-        font1 = pygame.font.Font('../res/Hyperspace.otf', 50)
-        font2 = pygame.font.Font('../res/Hyperspace.otf', 20)
-        font3 = pygame.font.Font('../res/Hyperspace.otf', 30)
-
-        titleText = font1.render('Asteroids', True, (180, 180, 180))
+        titleText = renderText(hudFont, 50, 'Asteroids', (180, 180, 180))
         titleTextRect = titleText.get_rect(centerx=self.stage.width/2)
         titleTextRect.y = self.stage.height/2 - titleTextRect.height*2
         self.stage.screen.blit(titleText, titleTextRect)
 
-        keysText = font2.render(
-            '(C) 1979 Atari INC.', True, (255, 255, 255))
+        keysText = renderText(
+            hudFont, 20, '(C) 1979 Atari INC.', (255, 255, 255))
         keysTextRect = keysText.get_rect(centerx=self.stage.width/2)
         keysTextRect.y = self.stage.height - keysTextRect.height - 20
         self.stage.screen.blit(keysText, keysTextRect)
 
-        instructionText = font3.render(
-            'Press start to Play', True, (200, 200, 200))
+        instructionText = renderText(
+            hudFont, 30, 'Press start to Play', (200, 200, 200))
         instructionTextRect = instructionText.get_rect(
             centerx=self.stage.width/2)
         instructionTextRect.y = self.stage.height/2 - instructionTextRect.height
         self.stage.screen.blit(instructionText, instructionTextRect)
 
     def displayScore(self):
-        font1 = pygame.font.Font('../res/Hyperspace.otf', 30)
         scoreStr = str("%02d" % self.score)
-        scoreText = font1.render(scoreStr, True, (200, 200, 200))
+        scoreText = renderText(hudFont, 30, scoreStr, (200, 200, 200))
         scoreTextRect = scoreText.get_rect(centerx=100, centery=45)
         self.stage.screen.blit(scoreText, scoreTextRect)
 
     def displayPaused(self):
         if self.paused:
-            font1 = pygame.font.Font('../res/Hyperspace.otf', 30)
-            pausedText = font1.render("Paused", True, (255, 255, 255))
+            pausedText = renderText(hudFont, 30, "Paused", (255, 255, 255))
             textRect = pausedText.get_rect(
                 centerx=self.stage.width/2, centery=self.stage.height/2)
             self.stage.screen.blit(pausedText, textRect)
@@ -306,6 +359,9 @@ class Asteroids():
 
                 if event.key == K_k:
                     self.killShip()
+
+                if event.key == K_r:
+                    self.toggleRendering()
                     
             elif event.type == KEYUP:
                 if event.key == K_o:
@@ -332,34 +388,45 @@ class Asteroids():
         newRocks = []
         shipHit, saucerHit = False, False
 
+        if self.saucer is not None:
+            if self.ship.bulletCollision(self.saucer):
+                saucerHit = True
+                self.score += self.saucer.scoreValue
+
+        # Broad phase, only the sprites sharing a grid cell with a rock
+        # need checking against it
+        movers = [self.ship] + self.ship.bullets
+        if self.saucer is not None:
+            movers += [self.saucer] + self.saucer.bullets
+        candidates = self.collisionGrid.candidatePairs(self.rockList, movers)
+
         # Rocks
         for rock in self.rockList:
+            nearby = candidates.get(rock)
+            if nearby is None:
+                continue
             rockHit = False
 
-            if not self.ship.inHyperSpace and rock.collidesWith(self.ship):
+            if not self.ship.inHyperSpace and self.ship in nearby \
+                    and rock.collidesWith(self.ship):
                 p = rock.checkPolygonCollision(self.ship)
                 if p is not None:
                     shipHit = True
                     rockHit = True
 
             if self.saucer is not None:
-                if rock.collidesWith(self.saucer):
+                if self.saucer in nearby and rock.collidesWith(self.saucer):
                     saucerHit = True
                     rockHit = True
 
-                if self.saucer.bulletCollision(rock):
+                if self.saucer.bulletCollision(rock, nearby):
                     rockHit = True
 
-                if self.ship.bulletCollision(self.saucer):
-                    saucerHit = True
-                    self.score += self.saucer.scoreValue
-
-            if self.ship.bulletCollision(rock):
+            if self.ship.bulletCollision(rock, nearby):
                 rockHit = True
 
             if rockHit:
-                self.rockList.remove(rock)
-                self.stage.spriteList.remove(rock)
+                self.stage.removeSprite(rock)
 
                 if rock.rockType == Rock.largeRockType:
                     # playSound("explode1")
@@ -377,9 +444,9 @@ class Asteroids():
                     # new rocks
                     for _ in range(0, 2):
                         position = Vector2d(rock.position.x, rock.position.y)
-                        newRock = Rock(self.stage, position, newRockType)
+                        newRock = Rock(self.stage, position, newRockType,
+                                       self.nextRockShape())
                         self.stage.addSprite(newRock)
-                        self.rockList.append(newRock)
 
                 self.createDebris(rock)
 
@@ -435,9 +502,8 @@ class Asteroids():
             self.stage.addSprite(debris)
 
     def displayFps(self):
-        font2 = pygame.font.Font('../res/Hyperspace.otf', 15)
         fpsStr = str(self.fps)+(' FPS')
-        scoreText = font2.render(fpsStr, True, (255, 255, 255))
+        scoreText = renderText(hudFont, 15, fpsStr, (255, 255, 255))
         scoreTextRect = scoreText.get_rect(
             centerx=(self.stage.width/2), centery=15)
         self.stage.screen.blit(scoreText, scoreTextRect)
@@ -465,15 +531,12 @@ class Asteroids():
         surface = self.stage.screen
         cx, cy = int(ship.position.x), int(ship.position.y)
 
-        if self.rockList:
-            nearest = min(self.rockList,
-                        key=lambda r: (r.position.x - ship.position.x)**2 +
-                                        (r.position.y - ship.position.y)**2
-                        )
-            
+        features = self.frameFeatures()
+        if features.nearest is not None:
+            nearest = features.nearest
             nx, ny = int(nearest.position.x), int(nearest.position.y)
 
-            angle_color = self.compute_angle_color(self.last_angle_diff)
+            angle_color = self.compute_angle_color(features.angleDiff)
             
             pygame.draw.line(surface, angle_color, (cx, cy), (nx, ny), 3)
 
@@ -495,24 +558,33 @@ class Asteroids():
         pygame.draw.line(surface, (100, 100, 255), (cx, cy), (lx, ly), 1)
         pygame.draw.line(surface, (100, 100, 255), (cx, cy), (rx, ry), 1)
 
-        # --- HUD con transparencia ---
-        hud = pygame.Surface((300, 100), pygame.SRCALPHA)
-        hud.fill((0, 0, 0, 130))
-
-        font = pygame.font.Font(None, 26)
-        text1 = font.render(f"Acción IA: {self.last_action}", True, (255,255,255))
-        text2 = font.render(f"Reward: {self.last_reward:.2f}", True, (255,255,255))
-        text3 = font.render(f"Alineación: {self.last_angle_diff:.2f}", True, (255,255,150))
-
-        hud.blit(text1, (10, 10))
-        hud.blit(text2, (10, 40))
-        hud.blit(text3, (10, 70))
-
+        hud = self.render_hud()
         hud_x = surface.get_width() - hud.get_width() - 10
         hud_y = 10
 
         surface.blit(hud, (hud_x, hud_y))
 
+    # --- HUD con transparencia ---
+    # Only re-rendered when one of the values shown actually changes
+    def render_hud(self):
+        lines = (f"Acción IA: {self.last_action}",
+                 f"Reward: {self.last_reward:.2f}",
+                 f"Alineación: {self.frameFeatures().angleDiff:.2f}")
+        if self.hud is not None and lines == self.hud_lines:
+            return self.hud
+
+        if self.hud is None:
+            self.hud = pygame.Surface((300, 100), pygame.SRCALPHA)
+        hud = self.hud
+        hud.fill((0, 0, 0, 130))
+
+        colors = ((255,255,255), (255,255,255), (255,255,150))
+        for i, (line, color) in enumerate(zip(lines, colors)):
+            hud.blit(renderText(None, 26, line, color), (10, 10 + 30 * i))
+
+        self.hud_lines = lines
+        return hud
+
     def compute_angle_color(self, angle_diff):
         t = min(angle_diff / math.pi, 1.0)
         r = int(255 * t)
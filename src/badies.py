@@ -16,7 +16,6 @@
 #    Copyright (C) 2018  Francisco Sanchez Arroyo
 #
 
-import random
 from .util.vectorsprites import *
 from .shooter import *
 from .soundManager import *
@@ -24,6 +23,8 @@ from .soundManager import *
 # Four different shape of rock each of which can be small, medium or large.
 # Smaller rocks are faster.
 class Rock(VectorSprite):
+
+    category = 'rocks'
     
     # indexes into the tuples below
     largeRockType = 0
@@ -33,15 +34,13 @@ class Rock(VectorSprite):
     velocities = (1.5, 3.0, 4.5)    
     scales = (2.5, 1.5, 0.6)
 
-    # tracks the last rock shape to be generated
-    rockShape = 1    
-    
-    # Create the rock polygon to the given scale
-    def __init__(self, stage, position, rockType):
+    # Create the rock polygon to the given scale, shape is 1 to 4
+    def __init__(self, stage, position, rockType, shape):
         
         scale = Rock.scales[rockType]
         velocity = Rock.velocities[rockType]                
-        heading = Vector2d(random.uniform(-velocity, velocity), random.uniform(-velocity, velocity))
+        rng = stage.rng
+        heading = Vector2d(rng.uniform(-velocity, velocity), rng.uniform(-velocity, velocity))
         
         # Ensure that the rocks don't just sit there or move along regular lines
         if heading.x == 0:
@@ -51,56 +50,50 @@ class Rock(VectorSprite):
             heading.y = 0.1
                         
         self.rockType = rockType  
-        pointlist = self.createPointList()
+        pointlist = self.createPointList(shape)
         newPointList = [self.scale(point, scale) for point in pointlist]        
         VectorSprite.__init__(self, position, heading, newPointList)
+
+        # Original Asteroid didn't have spinning rocks but they look nicer
+        self.vAngle = 1
                 
     
     # Create different rock type pointlists    
-    def createPointList(self):
+    def createPointList(self, shape):
         
-        if (Rock.rockShape == 1):
+        if (shape == 1):
             pointlist = [(-4,-12), (6,-12), (13, -4), (13, 5), (6, 13), (0,13), (0,4),\
                      (-8,13), (-15, 4), (-7,1), (-15,-3)]
  
-        elif (Rock.rockShape == 2):
+        elif (shape == 2):
             pointlist = [(-6,-12), (1,-5), (8, -12), (15, -5), (12,0), (15,6), (5,13),\
                          (-7,13), (-14,7), (-14,-5)]
             
-        elif (Rock.rockShape == 3):
+        elif (shape == 3):
             pointlist = [(-7,-12), (1,-9), (8,-12), (15,-5), (8,-3), (15,4), (8,12),\
                          (-3,10), (-6,12), (-14,7), (-10,0), (-14,-5)]            
 
-        elif (Rock.rockShape == 4):
+        elif (shape == 4):
             pointlist = [(-7,-11), (3,-11), (13,-5), (13,-2), (2,2), (13,8), (6,14),\
                          (2,10), (-7,14), (-15,5), (-15,-5), (-5,-5), (-7,-11)]
 
-        Rock.rockShape += 1
-        if (Rock.rockShape == 5):
-            Rock.rockShape = 1
-
         return pointlist
     
-    # Spin the rock when it moves
-    def move(self):
-        VectorSprite.move(self)                        
-        
-        # Original Asteroid didn't have spinning rocks but they look nicer
-        self.angle += 1
-    
     
 #    def destroyed(self):
         
 
 class Debris(Point):    
+
+    category = 'debris'
      
     def __init__(self, position, stage):
-        heading = Vector2d(random.uniform(-1.5, 1.5), random.uniform(-1.5, 1.5))
+        heading = Vector2d(stage.rng.uniform(-1.5, 1.5), stage.rng.uniform(-1.5, 1.5))
         Point.__init__(self, position, heading, stage)
         self.ttl = 50
     
-    def move(self):    
-        Point.move(self)
+    def update(self):    
+        Point.update(self)
         r,g,b = self.color
         r -= 5
         g -= 5
@@ -110,6 +103,8 @@ class Debris(Point):
 
 # Flying saucer, shoots at player
 class Saucer(Shooter):
+
+    category = 'saucers'
     
     # indexes into the tuples below
     largeSaucerType = 0
@@ -124,7 +119,7 @@ class Saucer(Shooter):
     bulletVelocity = 5  
     
     def __init__(self, stage, saucerType, ship):                
-        position = Vector2d(0.0, random.randrange(0, stage.height))
+        position = Vector2d(0.0, stage.rng.randrange(0, stage.height))
         heading = Vector2d(self.velocities[saucerType], 0.0)
         self.saucerType = saucerType
         self.ship = ship
@@ -144,9 +139,7 @@ class Saucer(Shooter):
         newPointList = [self.scale(point, self.scales[saucerType]) for point in self.pointlist]
         Shooter.__init__(self, position, heading, newPointList, stage)
         
-    def move(self):        
-        Shooter.move(self)  
-        
+    def update(self):        
         if (self.position.x > self.stage.width * 0.33) and (self.position.x < self.stage.width * 0.66):
             self.heading.y = self.heading.x
         else:
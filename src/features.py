@@ -0,0 +1,56 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import math
+
+# What the agent and the debug overlay need to know about the ship and the
+# nearest rock, worked out once per frame. Asteroids.frameFeatures() keeps the
+# features of the current frame and drops them as soon as the sprites move.
+
+
+class FrameFeatures:
+
+    def __init__(self, game):
+        ship = game.ship
+        self.ship = ship
+        self.nearest = None
+
+        # Direction the ship points in, as an angle in screen coordinates
+        shipRadians = math.radians(ship.angle)
+        self.shipAngle = math.atan2(-math.cos(shipRadians), -math.sin(shipRadians))
+
+        if not game.rockList:
+            self.dx = self.dy = 0.0
+            self.distance = 0.0
+            self.angleToRock = 0.0
+            self.angleDiff = 0.0
+            self.rewardAngleDiff = 0.0
+            return
+
+        sx, sy = ship.position.x, ship.position.y
+        nearest = min(game.rockList,
+                      key=lambda r: (r.position.x - sx)**2 + (r.position.y - sy)**2)
+        self.nearest = nearest
+        self.dx = nearest.position.x - sx
+        self.dy = nearest.position.y - sy
+        self.distance = math.sqrt(self.dx**2 + self.dy**2)
+        self.angleToRock = math.atan2(self.dy, self.dx)
+
+        # Angle between where the ship points and the rock, 0 to pi
+        rawDiff = abs(self.angleToRock - self.shipAngle)
+        self.angleDiff = min(rawDiff, 2*math.pi - rawDiff)
+
+        # The reward shaping measures the alignment against the raw ship angle
+        self.rewardAngleDiff = abs((self.angleToRock - shipRadians + math.pi) % (2*math.pi) - math.pi)
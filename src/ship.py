@@ -16,7 +16,6 @@
 #    Copyright (C) 2018  Francisco Sanchez Arroyo
 #
 
-import random
 from .util.vectorsprites import *
 from .shooter import *
 from math import *
@@ -25,6 +24,8 @@ from .soundManager import *
 
 class Ship(Shooter):
 
+    category = 'ships'
+
     # Class attributes
     acceleration = 0.2
     decelaration = -0.005
@@ -48,22 +49,6 @@ class Ship(Shooter):
 
         Shooter.__init__(self, position, heading, pointlist, stage)
 
-    def draw(self):
-        if self.visible:
-            if not self.inHyperSpace:
-                VectorSprite.draw(self)
-            else:
-                self.hyperSpaceTtl -= 1
-                if self.hyperSpaceTtl == 0:
-                    self.inHyperSpace = False
-                    self.color = (255, 255, 255)
-                    self.thrustJet.color = (255, 255, 255)
-                    self.position.x = random.randrange(0, self.stage.width)
-                    self.position.y = random.randrange(0, self.stage.height)
-                    position = Vector2d(self.position.x, self.position.y)
-                    self.thrustJet.position = position
-
-        return self.transformedPointlist
 
     def rotateLeft(self):
         self.angle += self.turnAngle
@@ -97,10 +82,20 @@ class Ship(Shooter):
         self.thrustJet.heading.x += dx
         self.thrustJet.heading.y += dy
 
-    def move(self):
-        VectorSprite.move(self)
+    def update(self):
         self.decreaseThrust()
 
+        if self.visible and self.inHyperSpace:
+            self.hyperSpaceTtl -= 1
+            if self.hyperSpaceTtl == 0:
+                self.inHyperSpace = False
+                self.color = (255, 255, 255)
+                self.thrustJet.color = (255, 255, 255)
+                self.position.x = self.stage.rng.randrange(0, self.stage.width)
+                self.position.y = self.stage.rng.randrange(0, self.stage.height)
+                position = Vector2d(self.position.x, self.position.y)
+                self.thrustJet.position = position
+
     # Break the shape of the ship down into several lines
     # Ship shape - [(0, -10), (6, 10), (3, 7), (-3, 7), (-6, 10)]
     def explode(self):
@@ -121,6 +116,7 @@ class Ship(Shooter):
         heading = Vector2d(0, 0)
         position = Vector2d(self.position.x, self.position.y)
         debris = VectorSprite(position, heading, pointlist, self.angle)
+        debris.category = 'debris'
 
         # Add debris to the stage
         self.stage.addSprite(debris)
@@ -131,9 +127,9 @@ class Ship(Shooter):
 
         # Alter the random values below to change the rate of expansion
         debris.heading.x = ((centerX - self.position.x) +
-                            0.1) / random.uniform(20, 40)
+                            0.1) / self.stage.rng.uniform(20, 40)
         debris.heading.y = ((centerY - self.position.y) +
-                            0.1) / random.uniform(20, 40)
+                            0.1) / self.stage.rng.uniform(20, 40)
         self.shipDebrisList.append(debris)
 
     # Set the bullet velocity and create the bullet
@@ -165,13 +161,11 @@ class ThrustJet(VectorSprite):
         heading = Vector2d(0, 0)
         self.accelerating = False
         self.ship = ship
-        VectorSprite.__init__(self, position, heading, self.pointlist)
+        # Black like update leaves it until the ship accelerates
+        VectorSprite.__init__(self, position, heading, self.pointlist, color=(0, 0, 0))
 
-    def draw(self):
+    def update(self):
         if self.accelerating and self.ship.inHyperSpace == False:
             self.color = (255, 255, 255)
         else:
             self.color = (0, 0, 0)
-
-        VectorSprite.draw(self)
-        return self.transformedPointlist
@@ -16,7 +16,6 @@
 #    Copyright (C) 2018  Francisco Sanchez Arroyo
 #
 
-import random
 from .util.vectorsprites import *
 from .util import *
 
@@ -37,9 +36,17 @@ class Shooter(VectorSprite):
             self.stage.addSprite(newBullet)
             return True
 
-    def bulletCollision(self, target):
+    # Check the bullets against the target. candidates, if given, are the
+    # sprites the broad phase found near the target; only our bullets among
+    # them are checked
+    def bulletCollision(self, target, candidates=None):
+        bullets = self.bullets
+        if candidates is not None:
+            bullets = [sprite for sprite in candidates
+                       if getattr(sprite, 'shooter', None) is self]
+
         collisionDetected = False
-        for bullet in self.bullets:
+        for bullet in bullets:
             if bullet.ttl > 0 and target.collidesWith(bullet):
                 collisionDetected = True
                 bullet.ttl = 0
@@ -51,13 +58,15 @@ class Shooter(VectorSprite):
 
 class Bullet(Point):
 
+    category = 'bullets'
+
     def __init__(self, position, heading, shooter, ttl, velocity, stage):
         Point.__init__(self, position, heading, stage)
         self.shooter = shooter
         self.ttl = ttl
         self.velocity = velocity
 
-    def move(self):
-        Point.move(self)
+    def update(self):
+        Point.update(self)
         if (self.ttl <= 0):
             self.shooter.bullets.remove(self)
@@ -0,0 +1,148 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import numpy as np
+from .util.vectorsprites import VectorSprite
+from .util.spritearrays import SpriteArrays
+from .util.geometry import calculateBoundingRect
+
+# Snapshots of a running game, for lookahead search and branching rollouts.
+# A snapshot is plain data: the game's own values, one (class, attributes)
+# record per sprite with the references between sprites replaced by
+# SpriteRefs, the rows of the sprites' state arrays and the state of the
+# game's random generator.
+# Restoring builds fresh sprites from the records without running their
+# constructors, so it uses no random numbers and a snapshot can be restored
+# any number of times (or pickled and restored in another process). Lists
+# are copied both ways so the game never shares one with a snapshot.
+
+# Values of the game itself, sprites and lists of sprites among them
+gameAttributes = ('gameState', 'score', 'lives', 'startLives', 'numRocks',
+                  'nextLife', 'secondsCount', 'explodingCount', 'rockShape',
+                  'ship', 'saucer', 'livesList')
+
+# Sprite attributes that are rebuilt on restore instead of being stored
+derivedAttributes = ('arrays', 'slot', 'transformedPointlist', 'boundingRect')
+
+# Sprite attributes that are never changed in place, shared with the snapshot
+sharedAttributes = ('pointlist',)
+
+
+# Index of a sprite in the snapshot's sprite records
+class SpriteRef(int):
+    pass
+
+
+# Stands for the game's stage in the sprite records
+class StageRef:
+    pass
+
+
+class GameSnapshot:
+
+    __slots__ = ('values', 'classes', 'records', 'state', 'onStage',
+                 'randomState')
+
+
+def takeSnapshot(game):
+    stage = game.stage
+
+    # Every sprite on the stage or reachable from the game or other sprites
+    sprites = []
+    indexes = {}
+
+    def find(value):
+        if isinstance(value, list):
+            for item in value:
+                find(item)
+        elif isinstance(value, VectorSprite) and id(value) not in indexes:
+            indexes[id(value)] = len(sprites)
+            sprites.append(value)
+
+    for sprite in stage.spriteList:
+        find(sprite)
+    for name in gameAttributes:
+        find(getattr(game, name, None))
+    i = 0
+    while i < len(sprites):
+        for name, value in vars(sprites[i]).items():
+            if name not in sharedAttributes:
+                find(value)
+        i += 1
+
+    def encode(value):
+        if isinstance(value, VectorSprite):
+            return SpriteRef(indexes[id(value)])
+        if value is stage:
+            return StageRef
+        if isinstance(value, list):
+            return [encode(item) for item in value]
+        return value
+
+    snapshot = GameSnapshot()
+    snapshot.values = {name: encode(getattr(game, name))
+                       for name in gameAttributes if hasattr(game, name)}
+    snapshot.classes = [type(sprite) for sprite in sprites]
+    snapshot.records = [{name: value if name in sharedAttributes else encode(value)
+                         for name, value in vars(sprite).items()
+                         if name not in derivedAttributes}
+                        for sprite in sprites]
+    snapshot.state = np.array([sprite.arrays.state[sprite.slot] for sprite in sprites])
+    snapshot.onStage = [indexes[id(sprite)] for sprite in stage.spriteList]
+    snapshot.randomState = game.rng.getstate()
+    return snapshot
+
+
+def restoreSnapshot(game, snapshot):
+    stage = game.stage
+    sprites = [cls.__new__(cls) for cls in snapshot.classes]
+
+    def decode(value):
+        if type(value) is SpriteRef:
+            return sprites[value]
+        if value is StageRef:
+            return stage
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        return value
+
+    for sprite, record in zip(sprites, snapshot.records):
+        sprite.__dict__.update({name: value if name in sharedAttributes else decode(value)
+                                for name, value in record.items()})
+        sprite.arrays = None
+
+    # The stage gets new registries and arrays with its sprites in their
+    # original order, the other sprites a set of arrays each
+    onStage = [sprites[i] for i in snapshot.onStage]
+    stage.initSprites()
+    stage.arrays = SpriteArrays(max(64, len(onStage)))
+    for sprite in onStage:
+        stage.register(sprite)
+        stage.arrays.add(sprite)
+    for sprite, row in zip(sprites, snapshot.state):
+        if sprite.arrays is None:
+            SpriteArrays(1).add(sprite)
+        sprite.arrays.state[sprite.slot] = row
+
+    # Snapshots are taken between frames, when the transformed pointlists
+    # and bounding rects match the positions, so they are simply recomputed
+    stage.transformSprites()
+    for sprite in sprites:
+        if sprite.arrays is not stage.arrays:
+            sprite.boundingRect = calculateBoundingRect(sprite.draw(), stage.rect)
+
+    for name, value in snapshot.values.items():
+        setattr(game, name, decode(value))
+    game.rng.setstate(snapshot.randomState)
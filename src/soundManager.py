@@ -19,14 +19,17 @@
 import pygame
 import sys
 import os
-import random
 from pygame.locals import *
 
 sounds = {}  # create empty dictionary of sounds
 
 
 def initSoundManager():
-    pygame.mixer.init()
+    # Servers used for training usually have no audio device, play silently
+    try:
+        pygame.mixer.init()
+    except pygame.error:
+        return
     sounds["fire"] = pygame.mixer.Sound("../res/FIRE.WAV")
     sounds["explode1"] = pygame.mixer.Sound("../res/EXPLODE1.WAV")
     sounds["explode2"] = pygame.mixer.Sound("../res/EXPLODE2.WAV")
@@ -39,12 +42,18 @@ def initSoundManager():
 
 
 def playSound(soundName):
+    if soundName not in sounds:
+        return
     channel = sounds[soundName].play()
 
 
 def playSoundContinuous(soundName):
+    if soundName not in sounds:
+        return
     channel = sounds[soundName].play(-1)
 
 
 def stopSound(soundName):
+    if soundName not in sounds:
+        return
     channel = sounds[soundName].stop()
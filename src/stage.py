@@ -19,13 +19,23 @@
 import pygame
 import sys
 import os
+import random
 from pygame.locals import *
+from .util.geometry import calculateBoundingRect
+from .util.spritearrays import SpriteArrays
+from .util.spriteregistry import SpriteRegistry
+
+# Sprite categories with a registry of their own on the stage. A sprite's
+# category is its category attribute, None for the ones that only need to be
+# in spriteList (e.g. the thrust jet)
+categories = ('rocks', 'bullets', 'debris', 'ships', 'saucers')
 
 
 class Stage:
 
-    # Set up the PyGame surface
-    def __init__(self, caption, dimensions=None):
+    # Set up the PyGame surface. rng is the random generator the sprites on
+    # this stage draw from, so that each game has a stream of its own
+    def __init__(self, caption, dimensions=None, rng=None):
         pygame.init()
 
         # If no screen size is provided pick the first available mode
@@ -39,40 +49,80 @@ class Stage:
 
         pygame.display.set_caption(caption)
         self.screen = pygame.display.get_surface()
-        self.spriteList = []
+        self.rect = self.screen.get_rect()
+        self.initSprites()
         self.width = dimensions[0]
         self.height = dimensions[1]
         self.showBoundingBoxes = False
-
-    # Add sprite to list then draw it as a easy way to get the bounding rect
+        self.rng = rng if rng is not None else random.Random()
+
+    # All the sprites are in spriteList and each category of them in a
+    # registry of its own (rocks, bullets...), all with O(1) add and remove
+    def initSprites(self):
+        self.spriteList = SpriteRegistry()
+        self.registries = {category: SpriteRegistry() for category in categories}
+        self.rocks = self.registries['rocks']
+        self.bullets = self.registries['bullets']
+        self.debris = self.registries['debris']
+        self.ships = self.registries['ships']
+        self.saucers = self.registries['saucers']
+        self.arrays = SpriteArrays()
+
+    # Add sprite to list and work out its bounding rect straight away
     def addSprite(self, sprite):
-        self.spriteList.append(sprite)
-        sprite.boundingRect = pygame.draw.aalines(
-            self.screen, sprite.color, True, sprite.draw())
+        self.register(sprite)
+        self.arrays.add(sprite)
+        sprite.boundingRect = calculateBoundingRect(sprite.draw(), self.rect)
+
+    # Put the sprite in spriteList and its category's registry
+    def register(self, sprite):
+        self.spriteList.add(sprite)
+        if sprite.category is not None:
+            self.registries[sprite.category].add(sprite)
 
     def removeSprite(self, sprite):
         self.spriteList.remove(sprite)
+        if sprite.category is not None:
+            self.registries[sprite.category].remove(sprite)
+        self.arrays.remove(sprite)
+
+    # Update the transformed pointlists and bounding rects used for the
+    # collisions. This is part of the simulation, it doesn't draw anything
+    def transformSprites(self):
+        self.arrays.transform(self.rect)
 
+    # Draw the sprites as they were left by transformSprites
     def drawSprites(self):
         for sprite in self.spriteList:
-            sprite.boundingRect = pygame.draw.aalines(
-                self.screen, sprite.color, True, sprite.draw())
+            pygame.draw.aalines(self.screen, sprite.color, True,
+                                sprite.transformedPointlist)
             if self.showBoundingBoxes == True:
                 pygame.draw.rect(self.screen, (255, 255, 255),
                                  sprite.boundingRect, 1)
 
+    # Move every sprite by its velocity, let each one do its own per frame
+    # logic and wrap the ones that have left the stage
     def moveSprites(self):
+        self.arrays.move()
         for sprite in self.spriteList:
-            sprite.move()
+            sprite.update()
+        self.arrays.wrap(self.width, self.height)
 
-            if sprite.position.x < 0:
-                sprite.position.x = self.width
 
-            if sprite.position.x > self.width:
-                sprite.position.x = 0
+# A stage for running the simulation without a window (e.g. AI training on a
+# server). Sprites move, wrap, expire and collide exactly as on a normal stage,
+# but nothing is drawn and no display surface is ever created.
+class HeadlessStage(Stage):
 
-            if sprite.position.y < 0:
-                sprite.position.y = self.height
+    def __init__(self, dimensions, rng=None):
+        self.screen = None
+        self.initSprites()
+        self.width = dimensions[0]
+        self.height = dimensions[1]
+        self.rect = Rect(0, 0, self.width, self.height)
+        self.showBoundingBoxes = False
+        self.rng = rng if rng is not None else random.Random()
 
-            if sprite.position.y > self.height:
-                sprite.position.y = 0
+    # Nothing to draw
+    def drawSprites(self):
+        pass
@@ -0,0 +1,50 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import pygame
+from collections import OrderedDict
+
+# Loading a font and rendering text are far too slow to do every frame, so
+# fonts are loaded once and rendered text is kept in a least recently used
+# cache. fontName is a font file or None for the pygame default font.
+
+hudFont = '../res/Hyperspace.otf'
+
+fonts = {}  # (fontName, size) -> Font
+textSurfaces = OrderedDict()  # (fontName, size, color, text) -> Surface
+maxTextSurfaces = 256
+
+
+def getFont(fontName, size):
+    key = (fontName, size)
+    font = fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(fontName, size)
+        fonts[key] = font
+    return font
+
+
+def renderText(fontName, size, text, color):
+    key = (fontName, size, color, text)
+    surface = textSurfaces.get(key)
+    if surface is not None:
+        textSurfaces.move_to_end(key)
+        return surface
+
+    surface = getFont(fontName, size).render(text, True, color)
+    textSurfaces[key] = surface
+    if len(textSurfaces) > maxTextSurfaces:
+        textSurfaces.popitem(last=False)
+    return surface
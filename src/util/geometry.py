@@ -16,6 +16,8 @@
 #    Copyright (C) 2018  Francisco Sanchez Arroyo
 #
 
+import numpy as np
+from math import floor
 from pygame import Rect
 
 #    Geometry functions to find intersecting lines.
@@ -160,6 +162,135 @@ def calculateIntersectPoint(p1, p2, p3, p4):
         return None
 
 
+# Vectorised version of calculateIntersectPoint for arrays of segments.
+# a1, a2, b1 and b2 are (..., 2) arrays (broadcast against each other) holding
+# the end points of segments a1-a2 and b1-b2. Uses the parametric form
+# p = a1 + t(a2 - a1) = b1 + u(b2 - b1) rather than gradients, so vertical
+# lines need no special case. Parallel segments only meet when they lay on
+# top of one another, in which case the start of the overlap is returned.
+# Zero length segments never intersect.
+# Returns a boolean hit array and an array with the intersect points
+
+
+def calculateIntersectPoints(a1, a2, b1, b2, tolerance=1e-9):
+    a1, a2, b1, b2 = (np.asarray(p, dtype=float) for p in (a1, a2, b1, b2))
+    r = a2 - a1
+    s = b2 - b1
+    q = b1 - a1
+
+    denom = cross(r, s)
+    qs = cross(q, s)
+    qr = cross(q, r)
+    rr = (r * r).sum(axis=-1)
+    ss = (s * s).sum(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Crossing lines
+        t = qs / denom
+        u = qr / denom
+        crossing = (np.abs(denom) > tolerance) & \
+            (t >= -tolerance) & (t <= 1 + tolerance) & \
+            (u >= -tolerance) & (u <= 1 + tolerance)
+
+        # Parallel lines laying on top of each other, t0 and t1 are the ends
+        # of b along a
+        t0 = (q * r).sum(axis=-1) / rr
+        t1 = t0 + (s * r).sum(axis=-1) / rr
+        overlapping = (np.abs(denom) <= tolerance) & \
+            (np.abs(qr) <= tolerance) & \
+            (np.maximum(t0, t1) >= -tolerance) & \
+            (np.minimum(t0, t1) <= 1 + tolerance)
+
+    hits = (crossing | overlapping) & (rr > 0) & (ss > 0)
+    t = np.where(crossing, t, np.clip(np.minimum(t0, t1), 0, 1))
+    t = np.where(hits, t, 0)
+    points = a1 + t[..., None] * r
+    return hits, points
+
+
+# Check every line of polygon 1 against every line of polygon 2 in one go.
+# Lines are taken in the same order as a double loop over the points would
+# (line i runs from point i-1 to point i) and the first intersect point is
+# returned as a list of ints, or None if the polygons don't intersect
+
+
+def calculatePolygonIntersectPoint(pointlist1, pointlist2):
+    hits, points = polygonIntersectPoints(pointlist1, pointlist2)
+    index = np.flatnonzero(hits)
+    if len(index) == 0:
+        return None
+    return [int(p) for p in points.reshape(-1, 2)[index[0]]]
+
+
+# Intersect points of all line pairs of two polygons as (n1, n2) arrays
+
+
+def polygonIntersectPoints(pointlist1, pointlist2):
+    points1 = np.asarray(pointlist1, dtype=float)
+    points2 = np.asarray(pointlist2, dtype=float)
+    a1 = np.roll(points1, 1, axis=0)[:, None]
+    a2 = points1[:, None]
+    b1 = np.roll(points2, 1, axis=0)[None]
+    b2 = points2[None]
+    return calculateIntersectPoints(a1, a2, b1, b2)
+
+
+# Batch version of calculatePolygonIntersectPoint for a list of
+# (pointlist1, pointlist2) pairs. All the line pairs of all the polygon pairs
+# are tested together. Returns a list with an intersect point or None for
+# each pair
+
+
+def calculatePolygonIntersectPointsBatch(pairs):
+    a1, a2, b1, b2, owners = [], [], [], [], []
+    for index, (pointlist1, pointlist2) in enumerate(pairs):
+        points1 = np.asarray(pointlist1, dtype=float)
+        points2 = np.asarray(pointlist2, dtype=float)
+        n1, n2 = len(points1), len(points2)
+        a1.append(np.repeat(np.roll(points1, 1, axis=0), n2, axis=0))
+        a2.append(np.repeat(points1, n2, axis=0))
+        b1.append(np.tile(np.roll(points2, 1, axis=0), (n1, 1)))
+        b2.append(np.tile(points2, (n1, 1)))
+        owners.append(np.full(n1 * n2, index))
+
+    results = [None] * len(pairs)
+    if not pairs:
+        return results
+
+    hits, points = calculateIntersectPoints(
+        np.concatenate(a1), np.concatenate(a2),
+        np.concatenate(b1), np.concatenate(b2))
+    owners = np.concatenate(owners)
+
+    # The first hit of each pair, line pairs are in loop order within a pair
+    hitIndex = np.flatnonzero(hits)
+    pairIndex, first = np.unique(owners[hitIndex], return_index=True)
+    for index, point in zip(pairIndex.tolist(),
+                            points[hitIndex[first]].tolist()):
+        results[index] = [int(p) for p in point]
+    return results
+
+
+def cross(v, w):
+    return v[..., 0] * w[..., 1] - v[..., 1] * w[..., 0]
+
+
+# Calc a bounding rect for a closed polygon without drawing it. It is an
+# approximation of the rect pygame.draw.aalines reports (often a pixel or two
+# off) that gives the same collision results. Like the drawn rect it is
+# clipped to the given clip rect (usually the screen)
+
+
+def calculateBoundingRect(pointlist, clipRect):
+    xs = [point[0] for point in pointlist]
+    ys = [point[1] for point in pointlist]
+    left = floor(min(xs))
+    top = floor(min(ys))
+    rect = Rect(left, top, floor(max(xs)) - left + 2,
+                floor(max(ys)) - top + 2)
+    return rect.clip(clipRect)
+
+
 # Test script below...
 if __name__ == "__main__":
 
@@ -204,4 +335,32 @@ if __name__ == "__main__":
     assert None != calculateIntersectPoint(
         p9, p10, p7, p8), "line 5 line 4 should intersect"
 
+    # The vectorised version finds every intersection the one above does (it
+    # also finds lines touching at their end points, which the Rect checks
+    # above can miss)
+    lines = [(p1, p2), (p3, p4), (p5, p6), (p7, p8), (p9, p10), (p11, p12)]
+    for pa, pb in lines:
+        for pc, pd in lines:
+            expected = calculateIntersectPoint(pa, pb, pc, pd)
+            hits, points = calculateIntersectPoints(pa, pb, pc, pd)
+            if expected is not None:
+                assert hits, "vectorised version missed an intersection"
+                assert abs(expected[0] - points[0]) <= 1 and \
+                    abs(expected[1] - points[1]) <= 1, "points differ"
+
+    hits, points = calculateIntersectPoints(
+        [p1, p5, p7, p9], [p2, p6, p8, p10], [p3, p1, p9, p5], [p4, p2, p10, p6])
+    assert list(hits) == [True, False, True, False], "array results differ"
+
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    assert None != calculatePolygonIntersectPoint(
+        square, [(5, 5), (15, 5), (15, 15)]), "polygons should intersect"
+    assert None == calculatePolygonIntersectPoint(
+        square, [(20, 20), (30, 20), (30, 30)]), "polygons shouldn't intersect"
+    assert None != calculatePolygonIntersectPoint(
+        square, [(10, 2), (10, 8), (20, 5)]), "collinear edges should intersect"
+    assert [None, [10, 10]] == calculatePolygonIntersectPointsBatch(
+        [(square, [(20, 20), (30, 20), (30, 30)]),
+         (square, [(5, 5), (15, 5), (15, 15)])]), "batch results differ"
+
     print("\nSUCCESS! All asserts passed for doLinesIntersect")
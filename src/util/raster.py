@@ -0,0 +1,64 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import numpy as np
+
+# Draws the outlines of the sprites straight into a small 2d NumPy array, for
+# pixel observations. No display or surface is involved: the points from the
+# last SpriteArrays.transform are scaled down and every edge is sampled about
+# once per output pixel, so a whole stage takes a few NumPy operations. Lines
+# are 1 pixel wide and not anti-aliased, and they wrap around the edges like
+# the stage does. Sprites the game draws black (the thrust jet when not
+# thrusting, the ship in hyperspace) are left out.
+
+
+class Rasteriser:
+
+    def __init__(self, stageSize, size=(84, 84)):
+        self.width, self.height = size
+        self.scale = np.array((self.width / stageSize[0], self.height / stageSize[1]))
+
+    # Draw the sprites of arrays into out, a (height, width) uint8 array
+    def draw(self, arrays, out, color=255):
+        out[:] = 0
+        points = arrays.points
+        if points is None:
+            return out
+
+        starts = arrays.starts
+        visible = np.array([any(arrays.sprites[slot].color) for slot in arrays.slots])
+        if not visible.any():
+            return out
+
+        # Polygons are closed, edge i runs from point i to the next one
+        following = np.arange(1, len(points) + 1)
+        following[starts[1:] - 1] = starts[:-1]
+        a = points * self.scale
+        delta = a[following] - a
+        keep = visible[arrays.vertexOwners]
+        a = a[keep]
+        delta = delta[keep]
+
+        # Samples along each edge, at least one per pixel it spans
+        steps = np.ceil(np.abs(delta).max(axis=1)).astype(int) + 1
+        edges = np.repeat(np.arange(len(a)), steps)
+        firsts = np.repeat(np.cumsum(steps) - steps, steps)
+        t = (np.arange(len(edges)) - firsts) / np.repeat(np.maximum(steps - 1, 1), steps)
+        samples = a[edges] + delta[edges] * t[:, None]
+
+        x = np.floor(samples[:, 0]).astype(int) % self.width
+        y = np.floor(samples[:, 1]).astype(int) % self.height
+        out[y, x] = color
+        return out
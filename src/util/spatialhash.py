@@ -0,0 +1,70 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from math import ceil
+
+# Uniform grid broad phase for the collisions. Sprites are bucketed by the
+# cells their bounding rect covers and only sprites sharing a cell are handed
+# to the narrow phase. The grid wraps around like the stage does, so a rect
+# hanging over one edge also lands in the cells on the opposite side.
+
+
+class SpatialHash:
+
+    def __init__(self, width, height, cellSize=80):
+        self.cellSize = cellSize
+        self.columns = max(1, ceil(width / cellSize))
+        self.rows = max(1, ceil(height / cellSize))
+
+        # Pairs handed to the narrow phase and pairs a brute force check
+        # would have tested, for the last call to candidatePairs and in total
+        self.candidateCount = 0
+        self.pairCount = 0
+        self.totalCandidateCount = 0
+        self.totalPairCount = 0
+
+    # Cells covered by a rect, an empty rect doesn't cover any
+    def cellsFor(self, rect):
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+
+        size = self.cellSize
+        columns = range(rect.left // size, (rect.right - 1) // size + 1)
+        rows = range(rect.top // size, (rect.bottom - 1) // size + 1)
+        return [(column % self.columns, row % self.rows)
+                for column in columns[:self.columns] for row in rows[:self.rows]]
+
+    # Map each sprite in targets to the sprites in others that share a cell
+    # with it. Only targets with at least one candidate are in the result
+    def candidatePairs(self, targets, others):
+        cells = {}
+        for target in targets:
+            for cell in self.cellsFor(target.boundingRect):
+                cells.setdefault(cell, []).append(target)
+
+        candidates = {}
+        for other in others:
+            seen = set()
+            for cell in self.cellsFor(other.boundingRect):
+                for target in cells.get(cell, ()):
+                    if id(target) not in seen:
+                        seen.add(id(target))
+                        candidates.setdefault(target, []).append(other)
+
+        self.candidateCount = sum(len(c) for c in candidates.values())
+        self.pairCount = len(targets) * len(others)
+        self.totalCandidateCount += self.candidateCount
+        self.totalPairCount += self.pairCount
+        return candidates
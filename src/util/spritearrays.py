@@ -0,0 +1,192 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import numpy as np
+from pygame import Rect
+
+# Struct of arrays holding the state of a set of sprites. Each sprite owns
+# one row (its slot) of the state array and its position, heading, angle,
+# spin and ttl are just views into that row, so a whole stage can be moved
+# and transformed with a handful of NumPy operations per frame.
+
+# Columns of the state array
+X, Y, HEADING_X, HEADING_Y, ANGLE, V_ANGLE, TTL = range(7)
+NUM_COLUMNS = 7
+
+
+class SpriteArrays:
+
+    def __init__(self, capacity=64):
+        self.state = np.zeros((capacity, NUM_COLUMNS))
+        self.sprites = [None] * capacity
+        self.freeSlots = list(range(capacity - 1, -1, -1))
+        self.count = 0
+
+        # Vertex buffers for the batched transform, rebuilt when sprites are
+        # added or removed
+        self.dirty = True
+        self.slots = None
+        self.vertices = None
+        self.vertexOwners = None
+        self.starts = None
+
+        # Transformed points of all the sprites from the last transform,
+        # sprite i of slots owns points[starts[i]:starts[i + 1]]
+        self.points = None
+
+    # Give the sprite a slot, copying its current state (if any) into it
+    def add(self, sprite):
+        if not self.freeSlots:
+            self.grow()
+        slot = self.freeSlots.pop()
+        if sprite.arrays is not None:
+            self.state[slot] = sprite.arrays.state[sprite.slot]
+        self.sprites[slot] = sprite
+        self.count += 1
+        self.dirty = True
+        sprite.arrays = self
+        sprite.slot = slot
+
+    # Take the sprite out, it keeps its state in a set of arrays of its own
+    def remove(self, sprite):
+        slot = sprite.slot
+        detached = SpriteArrays(1)
+        detached.add(sprite)
+        self.state[slot] = 0
+        self.sprites[slot] = None
+        self.freeSlots.append(slot)
+        self.count -= 1
+        self.dirty = True
+
+    def grow(self):
+        capacity = len(self.sprites)
+        state = np.zeros((capacity * 2, NUM_COLUMNS))
+        state[:capacity] = self.state
+        self.state = state
+        self.sprites.extend([None] * capacity)
+        self.freeSlots.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    # Apply the velocity and spin of every sprite
+    def move(self):
+        state = self.state
+        state[:, X:HEADING_X] += state[:, HEADING_X:ANGLE]
+        state[:, ANGLE] += state[:, V_ANGLE]
+
+    # Sprites that have left the stage reappear on the opposite side
+    def wrap(self, width, height):
+        x = self.state[:, X]
+        y = self.state[:, Y]
+        x[x < 0] = width
+        x[x > width] = 0
+        y[y < 0] = height
+        y[y > height] = 0
+
+    def buildVertices(self):
+        self.slots = [slot for slot, sprite in enumerate(self.sprites)
+                      if sprite is not None]
+        pointlists = [self.sprites[slot].pointlist for slot in self.slots]
+        lengths = [len(pointlist) for pointlist in pointlists]
+        self.vertices = np.array([point for pointlist in pointlists
+                                  for point in pointlist], dtype=float)
+        self.vertices = self.vertices.reshape(-1, 2)
+        self.vertexOwners = np.repeat(np.arange(len(self.slots)), lengths)
+        self.starts = np.concatenate(([0], np.cumsum(lengths)))
+        self.dirty = False
+
+    # Rotate and translate the pointlists of all the sprites in one go and
+    # update their transformed pointlists and bounding rects
+    def transform(self, clipRect):
+        if self.dirty:
+            self.buildVertices()
+        if not self.slots:
+            self.points = None
+            return
+
+        state = self.state[self.slots]
+        radians = np.radians(state[:, ANGLE])
+        owners = self.vertexOwners
+        points = transformPoints(self.vertices, np.cos(radians)[owners],
+                                 np.sin(radians)[owners],
+                                 state[owners, X:HEADING_X])
+
+        self.points = points
+
+        starts = self.starts[:-1]
+        mins = np.floor(np.minimum.reduceat(points, starts)).astype(int)
+        maxs = np.floor(np.maximum.reduceat(points, starts)).astype(int) + 2
+        rects = clipRects(mins, maxs, clipRect).tolist()
+
+        ends = self.starts[1:]
+        for slot, start, end, rect in zip(self.slots, starts, ends, rects):
+            sprite = self.sprites[slot]
+            sprite.transformedPointlist = points[start:end]
+            sprite.boundingRect = Rect(rect)
+
+
+# Rotate each x,y coord by its angle then translate it to its position.
+# The rotated points are truncated to integers like the original per point
+# version did
+def transformPoints(points, cosVals, sinVals, positions):
+    px = points[:, 0]
+    py = points[:, 1]
+    transformed = np.empty_like(points)
+    transformed[:, 0] = np.trunc(px * cosVals + py * sinVals)
+    transformed[:, 1] = np.trunc(py * cosVals - px * sinVals)
+    transformed += positions
+    return transformed
+
+
+# Clip (left, top) - (right, bottom) boxes to the clip rect, returning
+# (x, y, w, h) rows. Like Rect.clip a box outside of the clip rect becomes
+# an empty rect at its original position
+def clipRects(mins, maxs, clipRect):
+    rects = np.empty((len(mins), 4), dtype=int)
+    clippedMins = np.maximum(mins, clipRect.topleft)
+    clippedMaxs = np.minimum(maxs, clipRect.bottomright)
+    sizes = clippedMaxs - clippedMins
+    outside = (sizes <= 0).any(axis=1)
+    rects[:, 0:2] = np.where(outside[:, None], mins, clippedMins)
+    rects[:, 2:4] = np.where(outside[:, None], 0, sizes)
+    return rects
+
+
+# A Vector2d like view of two columns of a sprite's row
+class ArrayVector2d:
+
+    __slots__ = ('sprite', 'column')
+
+    def __init__(self, sprite, column):
+        self.sprite = sprite
+        self.column = column
+
+    @property
+    def x(self):
+        sprite = self.sprite
+        return float(sprite.arrays.state[sprite.slot, self.column])
+
+    @x.setter
+    def x(self, value):
+        sprite = self.sprite
+        sprite.arrays.state[sprite.slot, self.column] = value
+
+    @property
+    def y(self):
+        sprite = self.sprite
+        return float(sprite.arrays.state[sprite.slot, self.column + 1])
+
+    @y.setter
+    def y(self, value):
+        sprite = self.sprite
+        sprite.arrays.state[sprite.slot, self.column + 1] = value
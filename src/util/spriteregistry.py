@@ -0,0 +1,67 @@
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# An ordered set of sprites with O(1) add, remove and membership tests.
+# A removed sprite leaves a tombstone (None) in its place instead of shifting
+# the ones after it, so the order the sprites were added in is kept and
+# iterating is safe while sprites come and go: sprites removed during the
+# loop are skipped and sprites added during it are left for the next one,
+# like looping over a copy of a list. The tombstones are swept out once they
+# outnumber the sprites, but never in the middle of a loop.
+
+
+class SpriteRegistry:
+
+    def __init__(self, sprites=()):
+        self.items = []
+        self.positions = {}  # sprite -> index in items
+        self.iterating = 0
+        for sprite in sprites:
+            self.add(sprite)
+
+    def add(self, sprite):
+        self.positions[sprite] = len(self.items)
+        self.items.append(sprite)
+
+    def remove(self, sprite):
+        self.items[self.positions.pop(sprite)] = None
+        if not self.iterating and len(self.items) > 2 * len(self.positions) + 8:
+            self.compact()
+
+    # Sweep out the tombstones, keeping the order of the sprites
+    def compact(self):
+        self.items = [sprite for sprite in self.items if sprite is not None]
+        self.positions = {sprite: i for i, sprite in enumerate(self.items)}
+
+    def __contains__(self, sprite):
+        return sprite in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __bool__(self):
+        return bool(self.positions)
+
+    def __iter__(self):
+        items = self.items
+        end = len(items)
+        self.iterating += 1
+        try:
+            for i in range(end):
+                sprite = items[i]
+                if sprite is not None:
+                    yield sprite
+        finally:
+            self.iterating -= 1
@@ -20,15 +20,23 @@ import pygame
 import sys
 import os
 import math
-import random
+import numpy as np
 from math import *
 from .vector2d import *
 from .geometry import *
+from .spritearrays import *
 
 
 class VectorSprite:
 
+    # Stage registry the sprite goes in besides spriteList (see stage.py)
+    category = None
+
     def __init__(self, position, heading, pointlist, angle=0, color=(255, 255, 255)):
+        # position, heading, angle, vAngle and ttl live in a row of a
+        # SpriteArrays, a set of its own until the sprite joins a stage
+        self.arrays = None
+        SpriteArrays(1).add(self)
         self.position = position
         self.heading = heading
         self.angle = angle
@@ -39,45 +47,73 @@ class VectorSprite:
 
         #self.color = color = (random.randrange(40,255),random.randrange(40,255),random.randrange(40,255))
 
-    # rotate each x,y coord by the angle, then translate it to the x,y position
+    @property
+    def position(self):
+        return ArrayVector2d(self, X)
+
+    @position.setter
+    def position(self, position):
+        self.arrays.state[self.slot, X] = position.x
+        self.arrays.state[self.slot, Y] = position.y
+
+    @property
+    def heading(self):
+        return ArrayVector2d(self, HEADING_X)
+
+    @heading.setter
+    def heading(self, heading):
+        self.arrays.state[self.slot, HEADING_X] = heading.x
+        self.arrays.state[self.slot, HEADING_Y] = heading.y
+
+    @property
+    def angle(self):
+        return float(self.arrays.state[self.slot, ANGLE])
+
+    @angle.setter
+    def angle(self, angle):
+        self.arrays.state[self.slot, ANGLE] = angle
+
+    @property
+    def vAngle(self):
+        return float(self.arrays.state[self.slot, V_ANGLE])
+
+    @vAngle.setter
+    def vAngle(self, vAngle):
+        self.arrays.state[self.slot, V_ANGLE] = vAngle
+
+    @property
+    def ttl(self):
+        return int(self.arrays.state[self.slot, TTL])
+
+    @ttl.setter
+    def ttl(self, ttl):
+        self.arrays.state[self.slot, TTL] = ttl
+
+    # rotate each x,y coord by the angle, then translate it to the x,y position.
+    # Sprites on a stage are transformed all together by Stage.transformSprites
     def rotateAndTransform(self):
-        newPointList = [self.rotatePoint(point) for point in self.pointlist]
-        self.transformedPointlist = [
-            self.translatePoint(point) for point in newPointList]
+        radians = math.radians(self.angle)
+        position = self.arrays.state[self.slot, X:HEADING_X]
+        self.transformedPointlist = transformPoints(
+            np.array(self.pointlist, dtype=float).reshape(-1, 2),
+            math.cos(radians), math.sin(radians), position)
 
     # draw the sprite
     def draw(self):
         self.rotateAndTransform()
         return self.transformedPointlist
 
-    # translate each point to the current x, y position
-    def translatePoint(self, point):
-        newPoint = []
-        newPoint.append(point[0] + self.position.x)
-        newPoint.append(point[1] + self.position.y)
-        return newPoint
-
-    # Move the sprite by the velocity
+    # Move the sprite by the velocity. Sprites on a stage are moved all
+    # together by Stage.moveSprites, which then calls update on each of them
     def move(self):
         # Apply velocity
         self.position.x = self.position.x + self.heading.x
         self.position.y = self.position.y + self.heading.y
         self.angle = self.angle + self.vAngle
 
-        # needed?
-        # self.rotateAndTransform()
-
-    # Rotate a point by the given angle
-    def rotatePoint(self, point):
-        newPoint = []
-        cosVal = math.cos(radians(self.angle))
-        sinVal = math.sin(radians(self.angle))
-        newPoint.append(point[0] * cosVal + point[1] * sinVal)
-        newPoint.append(point[1] * cosVal - point[0] * sinVal)
-
-        # Keep points as integers
-        newPoint = [int(point) for point in newPoint]
-        return newPoint
+    # Per frame behaviour once the sprite has been moved
+    def update(self):
+        pass
 
     # Scale a point
     def scale(self, point, scale):
@@ -95,19 +131,10 @@ class VectorSprite:
             return False
 
     # Check each line from pointlist1 for intersection with
-    # the lines in pointlist2
+    # the lines in pointlist2, all line pairs are tested at once
     def checkPolygonCollision(self, target):
-        for i in range(0, len(self.transformedPointlist)):
-            for j in range(0, len(target.transformedPointlist)):
-                p1 = self.transformedPointlist[i-1]
-                p2 = self.transformedPointlist[i]
-                p3 = target.transformedPointlist[j-1]
-                p4 = target.transformedPointlist[j]
-                p = calculateIntersectPoint(p1, p2, p3, p4)
-                if (p != None):
-                    return p
-
-        return None
+        return calculatePolygonIntersectPoint(self.transformedPointlist,
+                                              target.transformedPointlist)
 
 # Used for bullets and debris
 
@@ -122,9 +149,7 @@ class Point(VectorSprite):
         self.stage = stage
         self.ttl = 30
 
-    def move(self):
+    def update(self):
         self.ttl -= 1
         if (self.ttl <= 0):
             self.stage.removeSprite(self)
-
-        VectorSprite.move(self)